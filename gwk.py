@@ -1,6 +1,13 @@
 #!./venv/Scripts/python.exe
 # -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from functools import partial
+from multiprocessing import get_context
 from pathlib import Path
 
 try:
@@ -13,15 +20,16 @@ except ImportError:
     print('请先安装依赖包。')
     exit(-1)
 
-from gwk.handlers.abs import HandlingException, SingleGachaFileHandler
-from gwk.handlers.biuuu import BiuuuJsonHandler
-from gwk.handlers.uigf import UigfJsonHandler
-from gwk.common import patch_id64
-
-HANDLERS: tuple[type[SingleGachaFileHandler], ...] = (
-    UigfJsonHandler,
-    BiuuuJsonHandler,
+from gwk.api import (
+    HANDLERS, HandlerNotFound, find_handler, handler_name, iter_records, passthrough, read_file, write_records,
 )
+from gwk.handlers.abs import HandlingException, SingleGachaFileHandler
+from gwk.common import fill_item_id, patch_id64
+from gwk.compression import split_suffix
+from gwk.items import DEFAULT_INDEX, IndexFormatError, ItemIdIndex, build_index
+from gwk.server import ConversionServer
+from gwk.watcher import DirectoryWatcher
+from gwk.watermarks import StateFormatError, Watermarks
 
 ego = Path(__file__).absolute()
 
@@ -57,22 +65,35 @@ def lister():
             continue
         if handler.abstract:
             continue
-        if handler.__name__.endswith('Handler'):
-            name = handler.__name__[:-7]
-        else:
-            name = handler.__name__
-        table.add_row(name, handler.description)
+        table.add_row(handler_name(handler), handler.description)
 
     Console().print(table)
 
 
-@cli.command('convert', help='将文件转换到另一种格式。')
+def is_streaming(name: str | None, fp: Path | None) -> bool:
+    """
+    判断处理器（未指定时按文件后缀识别）是否逐行存储祈愿记录。
+    """
+    if name:
+        return find_handler(name).streaming
+    if fp is None:
+        return False
+    return any(h.streaming and h().is_supported(fp) for h in HANDLERS if not h.abstract)
+
+
+@cli.command('convert', help='将文件转换到另一种格式。FILE 和 --save-to 可以是 - ，表示标准输入和标准输出。')
 @click.argument('file')
 @click.option('-s', '--save-to', metavar='FILE', help='输出到哪里。')
 @click.option('-r', '--reader', metavar='HANDLER', help='源格式的处理器。若不提供则自动识别。')
 @click.option('-w', '--writer', metavar='HANDLER', help='目标格式的处理器。默认与源格式处理器相同。')
 @click.option('--patch-id-64', is_flag=True,
               help='模拟生成祈愿记录的ID，并补充到数据集中。模拟ID在设计上保证是一个有符号64位整数。')
+@click.option('--fill-item-id', 'fill_item_id_', is_flag=True, help='根据物品名称查询 item_id ，并补充到数据集中。')
+@click.option('-l', '--level', type=int, metavar='LEVEL',
+              help='压缩等级。仅在输出文件的后缀是 .gz、.bz2、.xz、.lzma、.zst 时有效。')
+@click.option('-a', '--append', is_flag=True, help='追加到输出文件的末尾。仅支持逐行存储的格式（如 Ndjson、Csv）。')
+@click.option('--state', metavar='FILE',
+              help='增量转换的状态文件。只输出晚于上次转换的记录，完成后更新状态文件；文件不存在时输出所有记录。')
 @click.option('-F', '--force', is_flag=True, help='不提示，直接保存。')
 @click.help_option('-h', '--help', help='显示这份帮助信息。')
 def converter(
@@ -81,18 +102,27 @@ def converter(
         reader: str = None,
         writer: str = None,
         patch_id_64: str = None,
+        fill_item_id_: bool = False,
+        level: int = None,
+        append: bool = False,
+        state: str = None,
         force: bool = False,
 ):
     # --------------------------------
     # 校验
 
-    ifp = Path(file).absolute()
-    if not ifp.exists():
+    ifp = None if file == '-' else Path(file).absolute()
+    if ifp is not None and not ifp.exists():
         warning(f'{ifp!s} 文件不存在。')
         exit(ExitCode.FILE_NOTFOUND)
 
-    ofp = Path(save_to or file).absolute()
-    if ofp.exists() and not force:
+    target = save_to or file
+    ofp = None if target == '-' else Path(target).absolute()
+    if ofp is not None and ofp.exists() and not force and not append:
+        if ifp is None:
+            # 标准输入已被数据占用，无法询问
+            warning('目标文件已存在。请使用 -F 覆盖，或使用 -a 追加。')
+            exit(ExitCode.FILE_NOTFOUND)
         if ofp == ifp:
             if input('覆盖保存到输入数据的文件？y/[n] ')[:1] not in 'yY':
                 exit(ExitCode.FILE_NOTFOUND)
@@ -100,64 +130,111 @@ def converter(
             if input('目标文件已存在，确认覆盖？y/[n] ')[:1] not in 'yY':
                 exit(ExitCode.FILE_NOTFOUND)
 
-    # --------------------------------
-    # 读取
+    # 输出到标准输出时，提示信息改为输出到标准错误
+    echo = partial(click.echo, err=ofp is None)
 
-    if reader:
+    for name in filter(None, (reader, writer)):
         try:
-            parser = HANDLERS[[h.__name__ for h in HANDLERS].index(f'{reader}Handler')]()
-        except ValueError:
-            warning(f'处理器 {reader} 不存在。请使用 {ego.name} list 命令查看所有处理器。')
+            find_handler(name)
+        except HandlerNotFound:
+            warning(f'处理器 {name} 不存在。请使用 {ego.name} list 命令查看所有处理器。')
             exit(ExitCode.HANDLER_NOTFOUND)
+
+    watermarks = None
+    if state:
         try:
-            parser.read(ifp)
-        except HandlingException as e:
-            print(str(e))
+            watermarks = Watermarks.load(state)
+        except StateFormatError as e:
+            warning(f'状态文件无法使用：{e}')
             exit(ExitCode.UNKNOWN)
-        except:
-            Console().print_exception()
+
+    repairing = patch_id_64 or fill_item_id_
+
+    # --------------------------------
+    # 直通
+
+    raw = None
+    if not repairing and not append and not state and ifp is not None and ofp is not None:
+        parser, raw = passthrough(ifp, ofp, reader, writer, level)
+        if parser is not None:
+            echo(f'读取 {parser.rows_total_read} 条记录，已使用 {handler_name(parser)} 直通写入。')
+            return
+
+    # --------------------------------
+    # 边读边写
+
+    source = sys.stdin.buffer if ifp is None else ifp
+    destination = sys.stdout.buffer if ofp is None else ofp
+
+    if not repairing and (
+            ifp is None or ofp is None or append or is_streaming(reader, ifp) or is_streaming(writer, ofp)
+    ):
+        try:
+            records = iter_records(source, reader, watermarks=watermarks)
+        except HandlingException as e:
+            echo(str(e))
+            exit(ExitCode.HANDLER_NOTFOUND if not reader else ExitCode.UNKNOWN)
+        parser = records.handler
+        builder = find_handler(writer)() if writer else type(parser)()
+        builder.data.copy_info(parser.data)
+        try:
+            with records:
+                write_records(
+                    watermarks.track(records) if watermarks is not None else records,
+                    destination, builder, level=level, append=append,
+                )
+        except HandlingException as e:
+            echo(str(e))
             exit(ExitCode.UNKNOWN)
-    else:
-        for Parser in HANDLERS:
-            if Parser.abstract:
-                continue
-            parser = Parser()
-            if not parser.is_supported(ifp):
-                continue
-            try:
-                parser.read(ifp)
-                break
-            except HandlingException:
-                continue
+        echo(
+            f'读取 {parser.rows_total_read} 条记录，'
+            f'解析 {parser.rows_total_loaded} 条记录，'
+            + (f'跳过 {parser.rows_total_skipped} 条已输出的记录，' if watermarks is not None else '')
+            + f'已使用 {handler_name(builder)} 写入。'
+        )
+        if watermarks is not None:
+            watermarks.save(state)
+        return
+
+    # --------------------------------
+    # 读取
+
+    try:
+        if ifp is None:
+            with iter_records(source, reader, watermarks=watermarks) as records:
+                parser = records.handler
+                for record in records:
+                    parser.data[record.types].append(record)
+                parser.data.sort()
         else:
-            print('找不到合适的源格式处理器。')
-            exit(ExitCode.HANDLER_NOTFOUND)
+            parser = read_file(ifp, reader, watermarks=watermarks, raw=raw)
+    except HandlingException as e:
+        echo(str(e))
+        exit(ExitCode.HANDLER_NOTFOUND if not reader else ExitCode.UNKNOWN)
+    except:
+        Console(stderr=True).print_exception()
+        exit(ExitCode.UNKNOWN)
 
     # ----------------
 
-    if writer:
-        try:
-            builder = HANDLERS[[h.__name__ for h in HANDLERS].index(f'{writer}Handler')]()
-        except ValueError:
-            warning(f'处理器 {writer} 不存在。请使用 {ego.name} list 命令查看所有处理器。')
-            exit(ExitCode.HANDLER_NOTFOUND)
-    else:
-        builder = type(parser)()
+    builder = find_handler(writer)() if writer else type(parser)()
 
     # ----------------
 
-    rows_total_unload = parser.rows_total_read - parser.rows_total_loaded
+    rows_total_unload = parser.rows_total_read - parser.rows_total_loaded - parser.rows_total_skipped
     if rows_total_unload > 0:
-        print(
+        echo(
             f'读取 {parser.rows_total_read} 条记录，'
             f'解析 {parser.rows_total_loaded} 条记录，'
             f'有 {rows_total_unload} 条解析失败。'
         )
     else:
-        print(
+        echo(
             f'读取 {parser.rows_total_read} 条记录，'
             f'全部解析成功。'
         )
+    if watermarks is not None:
+        echo(f'跳过 {parser.rows_total_skipped} 条已输出的记录。')
 
     # --------------------------------
     # 修复
@@ -166,19 +243,214 @@ def converter(
 
     if patch_id_64:
         rows_total_broken, rows_total_effected = patch_id64(data)
-        print(
+        echo(
             f'总计 {rows_total_broken} 条记录缺失 ID，'
             f'为 {rows_total_effected} 条记录补充了 ID。'
         )
 
+    if fill_item_id_:
+        try:
+            rows_total_broken, rows_total_effected = fill_item_id(data)
+        except (OSError, IndexFormatError) as e:
+            warning(f'物品查询表无法使用：{e}')
+            exit(ExitCode.UNKNOWN)
+        echo(
+            f'总计 {rows_total_broken} 条记录缺失 item_id，'
+            f'为 {rows_total_effected} 条记录补充了 item_id。'
+        )
+
     # --------------------------------
     # 保存
 
-    name = builder.__class__.__name__
-    name = name[:-1] if name.endswith('Handler') else name
+    name = handler_name(builder)
     builder.data = data
-    builder.write(ofp)
-    print(f'已使用 {name} 写入。')
+    try:
+        if ofp is None or append:
+            write_records(
+                (record for records in data.values() for record in records),
+                destination, builder, level=level, append=append,
+            )
+        else:
+            builder.write(ofp, level=level)
+    except HandlingException as e:
+        echo(str(e))
+        exit(ExitCode.UNKNOWN)
+    echo(f'已使用 {name} 写入。')
+
+    if watermarks is not None:
+        for records in data.values():
+            for record in records:
+                watermarks.advance(record)
+        watermarks.save(state)
+
+
+def convert_watched(
+        ifp: Path,
+        save_to: Path,
+        reader: str = None,
+        writer: str = None,
+        patch_id_64: bool = False,
+        fill_item_id_: bool = False,
+        level: int = None,
+):
+    """
+    转换监视目录中的单个文件，结果以同名文件保存到 ``save_to`` 目录中。
+    压缩文件的输出沿用原来的压缩格式，但工作簿等二进制格式不会再压缩。
+    """
+    _, codec = split_suffix(ifp)
+    base = Path(ifp.stem) if codec else ifp
+
+    raw = None
+    if not (patch_id_64 or fill_item_id_):
+        binary = writer is not None and find_handler(writer).binary
+        suffix = find_handler(writer).supports[0] if writer else base.suffix
+        ofp = save_to / (base.stem + suffix + (ifp.suffix if codec and not binary else ''))
+        parser, raw = passthrough(ifp, ofp, reader, writer, level)
+        if parser is not None:
+            print(f'{ifp.name} -> {ofp.name}：读取 {parser.rows_total_read} 条，直通写入。')
+            return
+
+    parser = read_file(ifp, reader, raw=raw)
+    builder = find_handler(writer)() if writer else type(parser)()
+    if patch_id_64:
+        patch_id64(parser.data)
+    if fill_item_id_:
+        fill_item_id(parser.data)
+    builder.data = parser.data
+    ofp = save_to / (base.stem + builder.supports[0] + (ifp.suffix if codec and not builder.binary else ''))
+    builder.write(ofp, level=level)
+    print(f'{ifp.name} -> {ofp.name}：读取 {parser.rows_total_read} 条，解析 {parser.rows_total_loaded} 条。')
+
+
+@cli.command('watch', help='监视目录，自动转换新增或修改过的文件。')
+@click.argument('directory')
+@click.option('-s', '--save-to', metavar='DIR', required=True, help='转换结果保存到哪个目录。')
+@click.option('-r', '--reader', metavar='HANDLER', help='源格式的处理器。若不提供则自动识别。')
+@click.option('-w', '--writer', metavar='HANDLER', help='目标格式的处理器。默认与源格式处理器相同。')
+@click.option('--patch-id-64', is_flag=True,
+              help='模拟生成祈愿记录的ID，并补充到数据集中。模拟ID在设计上保证是一个有符号64位整数。')
+@click.option('--fill-item-id', 'fill_item_id_', is_flag=True, help='根据物品名称查询 item_id ，并补充到数据集中。')
+@click.option('-l', '--level', type=int, metavar='LEVEL', help='压缩等级。仅在转换压缩文件时有效。')
+@click.option('-i', '--interval', type=float, default=1.0, show_default=True, help='扫描间隔（秒）。')
+@click.option('-j', '--jobs', type=int, default=4, show_default=True, help='同时转换的文件数，即转换进程数。')
+@click.help_option('-h', '--help', help='显示这份帮助信息。')
+def watcher(
+        directory: str,
+        save_to: str,
+        reader: str = None,
+        writer: str = None,
+        patch_id_64: bool = False,
+        fill_item_id_: bool = False,
+        level: int = None,
+        interval: float = 1.0,
+        jobs: int = 4,
+):
+    idp = Path(directory).absolute()
+    if not idp.is_dir():
+        warning(f'{idp!s} 目录不存在。')
+        exit(ExitCode.FILE_NOTFOUND)
+    odp = Path(save_to).absolute()
+    if odp == idp:
+        warning('转换结果不能保存到被监视的目录中。')
+        exit(ExitCode.FILE_NOTFOUND)
+    odp.mkdir(parents=True, exist_ok=True)
+
+    for name in filter(None, (reader, writer)):
+        try:
+            find_handler(name)
+        except HandlerNotFound:
+            warning(f'处理器 {name} 不存在。请使用 {ego.name} list 命令查看所有处理器。')
+            exit(ExitCode.HANDLER_NOTFOUND)
+
+    if reader:
+        readers = [find_handler(reader)()]
+    else:
+        readers = [h() for h in HANDLERS if not h.abstract]
+
+    def on_error(fp: Path, e: BaseException):
+        warning(f'{fp.name} 转换失败：{e}')
+
+    # 转换是CPU密集的，放到进程池中才能真正并行；监视线程只负责计算摘要和等待结果。
+    # 子进程忽略 SIGINT ，由主进程负责停止。
+    with ProcessPoolExecutor(
+            max(1, jobs),
+            mp_context=get_context('spawn'),
+            initializer=signal.signal,
+            initargs=(signal.SIGINT, signal.SIG_IGN),
+    ) as converting:
+        convert = partial(
+            convert_watched,
+            save_to=odp, reader=reader, writer=writer, patch_id_64=patch_id_64, fill_item_id_=fill_item_id_,
+            level=level,
+        )
+        watching = DirectoryWatcher(
+            idp,
+            lambda fp: converting.submit(convert, fp).result(),
+            interval=interval,
+            workers=jobs,
+            accept=lambda fp: any(r.is_supported(fp) for r in readers),
+            on_error=on_error,
+        )
+        print(f'正在监视 {idp!s} ，按 Ctrl+C 退出。')
+        watching.run()
+    print('已停止监视。')
+
+
+@cli.command('update-items', help='从本地数据文件重新生成物品 item_id 查询表。')
+@click.argument('source')
+@click.option('-s', '--save-to', metavar='FILE', help='查询表保存到哪里。默认覆盖随包附带的查询表。')
+@click.help_option('-h', '--help', help='显示这份帮助信息。')
+def items_updater(source: str, save_to: str = None):
+    sfp = Path(source).absolute()
+    if not sfp.exists():
+        warning(f'{sfp!s} 文件不存在。')
+        exit(ExitCode.FILE_NOTFOUND)
+
+    ofp = Path(save_to).absolute() if save_to else DEFAULT_INDEX
+    if ofp.exists():
+        try:
+            with ItemIdIndex(ofp) as index:
+                print(f'原查询表版本 {index.version or "未知"}，共 {len(index)} 条。')
+        except IndexFormatError:
+            pass
+    try:
+        version, total = build_index(sfp, ofp)
+    except IndexFormatError as e:
+        print(str(e))
+        exit(ExitCode.UNKNOWN)
+    print(f'已生成查询表，版本 {version or "未知"}，共 {total} 条。')
+
+
+@cli.command('serve', help='启动本地HTTP转换服务。')
+@click.option('-H', '--host', default='127.0.0.1', show_default=True, help='监听的地址。')
+@click.option('-p', '--port', type=int, default=8086, show_default=True, help='监听的端口。')
+@click.option('-j', '--jobs', type=int, default=2, show_default=True, help='转换进程数。')
+@click.option('--max-jobs', type=int, metavar='N', help='同时进行的转换数上限。默认是转换进程数的两倍。')
+@click.option('--max-size', type=int, default=64, show_default=True, metavar='MB', help='上传文件的大小上限（MB）。')
+@click.help_option('-h', '--help', help='显示这份帮助信息。')
+def server(
+        host: str = '127.0.0.1',
+        port: int = 8086,
+        jobs: int = 2,
+        max_jobs: int = None,
+        max_size: int = 64,
+):
+    try:
+        serving = ConversionServer((host, port), workers=jobs, max_jobs=max_jobs, max_size=max_size << 20)
+    except OSError as e:
+        warning(f'无法监听 {host}:{port}：{e}')
+        exit(ExitCode.UNKNOWN)
+    def interrupt(*_):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, interrupt)
+    with serving:
+        print(f'正在监听 http://{host}:{serving.server_address[1]}/ ，按 Ctrl+C 退出。')
+        try:
+            serving.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    print('已停止服务。')
 
 
 if __name__ == '__main__':
@@ -4,3 +4,14 @@ __author__ = '砹小翼'
 __version__ = '1.0'
 
 version = (1, 0, 0)
+
+from gwk.api import (  # noqa: E402
+    HANDLERS,
+    HandlerNotFound,
+    RecordIterator,
+    find_handler,
+    iter_records,
+    read_file,
+    write_records,
+)
+from gwk.handlers.abs import HandlingException  # noqa: E402
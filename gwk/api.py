@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+GWK 接口包。供其它程序在进程内调用转换功能，所有错误都以异常的形式抛出，不会退出进程或等待输入。
+
+>>> import gwk
+>>>
+>>> records = gwk.iter_records('uigf.json.gz')
+>>> with open('biuuu.json', 'wb') as f:
+>>>     gwk.write_records(records, f, 'BiuuuJson')
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    'HANDLERS',
+    'HandlerNotFound',
+    'RecordIterator',
+    'find_handler',
+    'handler_name',
+    'passthrough',
+    'read_file',
+    'iter_records',
+    'write_records',
+]
+
+import io
+import os
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator, Union
+
+from gwk.compression import CodecUnavailable, open_file, open_stream, split_suffix
+from gwk.handlers.abs import HandlingException, SingleGachaFileHandler
+from gwk.handlers.base_json import SingleGachaJsonHandler
+from gwk.handlers.biuuu import BiuuuJsonHandler
+from gwk.handlers.lines import CsvHandler, NdjsonHandler
+from gwk.handlers.uigf import UigfJsonHandler
+from gwk.handlers.xlsx import UigfXlsxHandler
+from gwk.models import GachaData, Record
+from gwk.watermarks import Watermarks
+
+HANDLERS: tuple[type[SingleGachaFileHandler], ...] = (
+    UigfJsonHandler,
+    BiuuuJsonHandler,
+    UigfXlsxHandler,
+    NdjsonHandler,
+    CsvHandler,
+)
+"""
+所有处理器。自动识别源格式时按此顺序尝试。
+"""
+
+Source = Union[str, os.PathLike, bytes, bytearray, memoryview, IO]
+Writer = Union[str, type[SingleGachaFileHandler], SingleGachaFileHandler]
+
+
+class HandlerNotFound(HandlingException):
+
+    def __init__(self, name: str):
+        self.name = name
+        self.msg = f'处理器 {name} 不存在。'
+
+
+def handler_name(handler: type[SingleGachaFileHandler] | SingleGachaFileHandler) -> str:
+    """
+    处理器的名称，即去掉 Handler 后缀的类名。
+    """
+    if not isinstance(handler, type):
+        handler = type(handler)
+    name = handler.__name__
+    return name[:-7] if name.endswith('Handler') else name
+
+
+def find_handler(name: str) -> type[SingleGachaFileHandler]:
+    """
+    根据名称（不含 Handler 后缀）查找处理器。
+
+    :raise HandlerNotFound: 处理器不存在。
+    """
+    for handler in HANDLERS:
+        if handler.__name__ == f'{name}Handler':
+            return handler
+    raise HandlerNotFound(name)
+
+
+def resolve_handler(handler: Writer) -> SingleGachaFileHandler:
+    """
+    将处理器的名称、类或实例统一转换成实例。
+
+    :raise HandlerNotFound: 处理器不存在。
+    """
+    if isinstance(handler, SingleGachaFileHandler):
+        return handler
+    if isinstance(handler, str):
+        handler = find_handler(handler)
+    return handler()
+
+
+def read_file(
+        fp: Path | str,
+        reader: str = None,
+        watermarks: Watermarks = None,
+        raw: dict = None,
+) -> SingleGachaFileHandler:
+    """
+    读取文件。若不指定处理器，则依次尝试所有支持该文件的处理器。
+
+    :param fp: 文件地址。
+    :param reader: 处理器的名称。
+    :param watermarks: 水位线。不晚于水位线的祈愿记录会被跳过。
+    :param raw: 已经解码的JSON原始数据（例如 ``passthrough()`` 的返回值）。JSON格式的处理器会直接解析它，不再读取文件。
+    :return: 读取了数据的处理器。
+    :raise HandlerNotFound: 指定的处理器不存在。
+    :raise HandlingException: 找不到合适的处理器，或指定的处理器读取失败。
+    """
+
+    def load(parser: SingleGachaFileHandler):
+        parser.watermarks = watermarks
+        if raw is not None and isinstance(parser, SingleGachaJsonHandler):
+            parser.load(raw)
+        else:
+            parser.read(fp)
+
+    if reader:
+        parser = find_handler(reader)()
+        load(parser)
+        return parser
+
+    for Parser in HANDLERS:
+        if Parser.abstract:
+            continue
+        parser = Parser()
+        if not parser.is_supported(fp):
+            continue
+        try:
+            load(parser)
+            return parser
+        except HandlingException:
+            continue
+    raise HandlingException('找不到合适的源格式处理器。')
+
+
+def passthrough(
+        ifp: Path | str,
+        ofp: Path | str,
+        reader: str = None,
+        writer: str = None,
+        level: int = None,
+) -> tuple[SingleGachaFileHandler | None, dict | None]:
+    """
+    源格式与目标格式相同，并且处理器支持直通转换（有 ``.passthrough()`` 方法）时，不解析祈愿记录，直接改写文件信息后写出。
+
+    >>> handler, raw = passthrough('a.json', 'b.json')
+    >>> if handler is None:
+    >>>     handler = read_file('a.json', raw=raw)
+
+    :param ifp: 源文件地址。
+    :param ofp: 目标文件地址。
+    :param reader: 源格式处理器的名称。若不提供则自动识别。
+    :param writer: 目标格式处理器的名称。若不提供则与源格式相同。
+    :param level: 压缩等级。仅在写入压缩文件时有效。
+    :return: 完成转换的处理器，以及解码得到的原始数据。不适用直通转换时处理器为 None ，此时应当改用完整转换，
+             并把原始数据（如果有）交给 ``read_file()`` ，以免再次解码。
+    :raise HandlerNotFound: 指定的处理器不存在。
+    """
+    if reader and writer and reader != writer:
+        return None, None
+    name = reader or writer
+    candidates = [find_handler(name)] if name else HANDLERS
+    for Handler in candidates:
+        if Handler.abstract or not hasattr(Handler, 'passthrough'):
+            continue
+        handler = Handler()
+        if not reader and not handler.is_supported(ifp):
+            continue
+        try:
+            raw = handler.decode_file(ifp)
+        except HandlingException:
+            continue
+        try:
+            handler.passthrough(raw, ofp, level=level)
+        except HandlingException:
+            return None, raw
+        return handler, raw
+    return None, None
+
+
+class RecordIterator(Iterator[Record]):
+    """
+    逐条读取祈愿记录的迭代器。
+
+    ``.handler`` 是读取所用的处理器；``.data`` 只包含文件信息（玩家ID、语言、导出时间等），不包含祈愿记录。
+    迭代结束或调用 ``.close()`` 后会释放打开的文件。
+    """
+
+    def __init__(self, handler: SingleGachaFileHandler, records: Iterator[Record], release: Callable[[], object]):
+        self.handler = handler
+        self._records = records
+        self._release = release
+
+    @property
+    def data(self) -> GachaData:
+        return self.handler.data
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Record:
+        try:
+            return next(self._records)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self._release is not None:
+            self._release()
+            self._release = None
+
+
+def open_text(source: IO, encoding: str, newline: str = None) -> tuple[IO[str], Callable[[], object]]:
+    """
+    将调用者打开的流包装成（解压后的）文本流。
+
+    :return: 文本流，以及释放包装的函数。释放时不会关闭 ``source`` 。
+    """
+    if isinstance(source.read(0), str):
+        return source, lambda: None
+
+    buffered = source if hasattr(source, 'peek') else io.BufferedReader(source)
+    stream = open_stream(buffered)
+    text = io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+    def release():
+        text.detach()
+        if stream is not buffered:
+            stream.close()
+        if buffered is not source:
+            buffered.detach()
+
+    return text, release
+
+
+def iter_records(
+        source: Source,
+        reader: str = None,
+        encoding: str = 'UTF-8',
+        watermarks: Watermarks = None,
+) -> RecordIterator:
+    """
+    逐条读取祈愿记录。
+
+    文件信息会立即读取并校验，祈愿记录则在迭代时才逐条解析，不会放进 ``GachaData`` 。
+
+    :param source: 文件地址、``bytes`` ，或者已经打开的文本流/二进制流。压缩数据会自动解压。
+    :param reader: 源格式处理器的名称。若不提供则自动识别。
+    :param encoding: 字符编码。仅在 ``source`` 不是文本流时使用。
+    :param watermarks: 水位线。不晚于水位线的祈愿记录会被跳过。
+    :raise HandlerNotFound: 指定的处理器不存在。
+    :raise HandlingException: 找不到合适的处理器，或指定的处理器读取失败。
+    """
+    candidates = [find_handler(reader)] if reader else [h for h in HANDLERS if not h.abstract]
+
+    if isinstance(source, (str, os.PathLike)):
+        fp = Path(source)
+        for Handler in candidates:
+            handler = Handler()
+            if not reader and not handler.is_supported(fp):
+                continue
+            handler.watermarks = watermarks
+            try:
+                f = open(fp, 'rb') if handler.binary else open_file(fp, 'r', encoding=encoding, newline=handler.newline)
+            except CodecUnavailable as e:
+                raise HandlingException(str(e))
+            try:
+                records = handler.iter_read(f)
+            except HandlingException:
+                f.close()
+                if reader:
+                    raise
+                continue
+            return RecordIterator(handler, records, f.close)
+        raise HandlingException('找不到合适的源格式处理器。')
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif len(candidates) > 1 and not (hasattr(source, 'seekable') and source.seekable()):
+        # 自动识别时可能需要从头读取多次
+        content = source.read()
+        source = io.StringIO(content) if isinstance(content, str) else io.BytesIO(content)
+
+    text = isinstance(source.read(0), str)
+    for Handler in candidates:
+        handler = Handler()
+        handler.watermarks = watermarks
+        if handler.binary and text:
+            if reader:
+                raise HandlingException(f'处理器 {reader} 只能读取二进制流。')
+            continue
+        start = source.tell() if len(candidates) > 1 else None
+        try:
+            f, release = (source, lambda: None) if handler.binary else open_text(source, encoding, handler.newline)
+        except CodecUnavailable as e:
+            raise HandlingException(str(e))
+        try:
+            records = handler.iter_read(f)
+        except HandlingException:
+            release()
+            if reader:
+                raise
+            source.seek(start)
+            continue
+        return RecordIterator(handler, records, release)
+    raise HandlingException('找不到合适的源格式处理器。')
+
+
+def write_records(
+        records: Iterable[Record],
+        fileobj: str | os.PathLike | IO,
+        writer: Writer,
+        encoding: str = 'UTF-8',
+        level: int = None,
+        append=False,
+        **kwargs
+):
+    """
+    逐条写入祈愿记录。
+
+    若 ``records`` 是 ``iter_records()`` 的返回值，且 ``writer`` 不是处理器实例，则会沿用源文件的文件信息。
+
+    :param records: 祈愿记录。
+    :param fileobj: 文件地址，或者已经打开的文本流/二进制流。写入完毕后不会关闭调用者打开的流。
+    :param writer: 目标格式处理器的名称、类或实例。
+    :param encoding: 字符编码。仅在 ``fileobj`` 不是文本流时使用。
+    :param level: 压缩等级。仅在 ``fileobj`` 是压缩文件的地址，或目标格式本身是压缩格式（如 xlsx）时有效。
+    :param append: 是否追加到文件末尾。仅在 ``fileobj`` 是文件地址时有效，并且只有逐行存储的格式（如 NDJSON）支持。
+    :param kwargs: 传给处理器 ``.write_records()`` 的其它参数。
+    :raise HandlerNotFound: 指定的处理器不存在。
+    :raise HandlingException: 写入失败，或目标格式不支持追加。
+    """
+    builder = resolve_handler(writer)
+    header = getattr(records, 'data', None)
+    if isinstance(header, GachaData) and builder is not writer:
+        builder.data.copy_info(header)
+
+    if isinstance(fileobj, (str, os.PathLike)) and hasattr(builder, 'write_file'):
+        builder.write_file(records, fileobj, encoding, level, append)
+        return
+    if append and isinstance(fileobj, (str, os.PathLike)):
+        raise HandlingException(f'处理器 {handler_name(builder)} 不支持追加写入。')
+
+    if builder.binary:
+        if isinstance(fileobj, io.TextIOBase):
+            raise HandlingException(f'处理器 {handler_name(builder)} 只能写入二进制流。')
+        if isinstance(fileobj, (str, os.PathLike)):
+            if split_suffix(fileobj)[1] is not None:
+                raise HandlingException(f'处理器 {handler_name(builder)} 不支持写入压缩文件。')
+            with open(fileobj, 'wb') as f:
+                builder.write_records(records, f, level=level, **kwargs)
+        else:
+            builder.write_records(records, fileobj, level=level, **kwargs)
+        return
+
+    if isinstance(fileobj, (str, os.PathLike)):
+        try:
+            f = open_file(fileobj, 'w', encoding=encoding, level=level, newline=builder.newline)
+        except CodecUnavailable as e:
+            raise HandlingException(str(e))
+        with f:
+            builder.write_records(records, f, **kwargs)
+        return
+
+    if isinstance(fileobj, io.TextIOBase):
+        builder.write_records(records, fileobj, **kwargs)
+        return
+
+    text = io.TextIOWrapper(fileobj, encoding=encoding, newline=builder.newline)
+    try:
+        builder.write_records(records, text, **kwargs)
+    finally:
+        text.flush()
+        text.detach()
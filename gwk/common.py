@@ -1,53 +1,144 @@
 # -*- coding: utf-8 -*-
-from itertools import groupby
+from __future__ import annotations
+
+from datetime import datetime, timedelta
 
 from gwk.constants import DT_DREAM_START
-from gwk.models import GachaData
+from gwk.items import ItemIdIndex
+from gwk.models import GachaData, Record
+
+
+ID64_MAX = (1 << 63) - 1
+"""
+有符号64位整数的上限。
+"""
+
+SECOND = timedelta(seconds=1)
+
+
+def encode_id64(time: datetime, uid: str | int, offset: int = 0) -> int | None:
+    """
+    计算模拟ID，即 ``时间戳 × 10^10 + 玩家UID × 10 + 偏移量`` 。
+
+    :param time: 祈愿时间。
+    :param uid: 玩家UID，不能超过 9 位。
+    :param offset: 偏移量，0~9 。
+    :return: 模拟ID。参数不能组成有效的模拟ID时返回 None 。
+    """
+    try:
+        userid = int(uid or 0)
+    except ValueError:
+        return None
+    if not time or not 0 <= userid < 10 ** 9 or not 0 <= offset < 10:
+        return None
+    stamp = (time - DT_DREAM_START) // SECOND
+    if stamp < 0:
+        return None
+    value = stamp * 10 ** 10 + userid * 10 + offset
+    return value if value <= ID64_MAX else None
+
+
+def decode_id64(value: int | str) -> tuple[datetime, str, int]:
+    """
+    将模拟ID还原成生成它的参数，是 ``encode_id64()`` 的逆运算。
+
+    >>> decode_id64('610848001000000010')  # (datetime(2022, 9, 5, 0, 0), '100000001', 0)
+
+    :return: 祈愿时间、玩家UID（补足 9 位）、偏移量。
+    :raise ValueError: 不是一个非负整数。
+    """
+    value = int(value)
+    if value < 0:
+        raise ValueError(f'{value!r} is not a valid id64')
+    stamp, rest = divmod(value, 10 ** 10)
+    userid, offset = divmod(rest, 10)
+    return DT_DREAM_START + stamp * SECOND, str(userid).rjust(9, '0'), offset
 
 
 def patch_id64(data: GachaData, uid: str = None) -> tuple[int, int]:
     """
     模拟生成祈愿记录的ID，并补充到数据集中。
 
-    模拟ID在设计上保证是一个有符号64位整数：
+    模拟ID在设计上保证是一个有符号64位整数（见 ``encode_id64()`` ）：
       - 祈愿时间戳，以原神开服当天的零点为起点。2023-11-29 9:46:40 以后是 9位。
       - 玩家UID，9位。
       - 用于区别十连祈愿产生相同时间的记录的偏移量，1位。
 
-    以下两点需要注意：
+    只遍历一次数据集，同时收集已有的ID；生成的每个模拟ID都会与已有的ID（以及已经生成的模拟ID）比对，
+    冲突时递增偏移量，偏移量用尽则跳过该记录。祈愿记录的顺序不会改变。
+
+    以下几点需要注意：
       - 祈愿记录 ``time`` 字段不能为空，否则将会跳过填充。
-      - 2049-12-20 4:46:43 以后的祈愿记录的模拟ID会超过有符号64位整数上限。
+      - 玩家UID必须是不超过 9 位的数字，否则将会跳过填充。
+      - 2049-12-20 4:46:43 以后的祈愿记录的模拟ID会超过有符号64位整数上限，将会跳过填充。
 
     :param data: 祈愿数据集。
     :param uid: 玩家ID。仅在 ``data.uid`` 和祈愿记录 ``uid`` 字段同时为空时使用。
     :return: 两个整数。前者是缺失 ``id`` 的祈愿记录的总数，后者是使用了模拟ID填充的记录总数。
     """
-    rows_total_broken = len([0 for rows in data.values() for row in rows if not row.id])
+    existing: set[int] = set()
+    broken: list[Record] = []
+    for rows in data.values():
+        for row in rows:
+            if not row.id:
+                broken.append(row)
+            elif isinstance(row.id, int) or str(row.id).isdecimal():
+                existing.add(int(row.id))
+
     rows_total_effected = 0
-    epoch = DT_DREAM_START.timestamp()
+    offsets: dict[int, int] = {}  # 偏移量为 0 的模拟ID → 下一个要尝试的偏移量
 
-    for gacha_type in data:
+    for row in broken:
+        base = encode_id64(row.time, row.uid or data.uid or uid)
+        if base is None:
+            continue
+        offset = offsets.get(base, 0)
+        while offset < 10 and base + offset in existing:
+            offset += 1
+        offsets[base] = offset + 1
+        if offset >= 10 or base + offset > ID64_MAX:
+            continue
+        existing.add(base + offset)
+        row.id = str(base + offset)
+        rows_total_effected += 1
 
-        results = list()
-        for time, group in groupby(data[gacha_type], key=GachaData.key_):
-            rows = list(sorted(group, key=lambda r: r.id))
+    if rows_total_effected:
+        data.invalidate()
+    return len(broken), rows_total_effected
 
-            if not time:
-                results.extend(rows)
-                continue
 
-            offset = -1
-            for row in rows:
-                if row.id:
-                    continue
-                offset += 1
-                rows_total_effected += 1
-                stamp = str(int(row.time.timestamp() - epoch))
-                userid = (row.uid or data.uid or uid or '').rjust(9, '0')
-                suffix = str(offset)
-                row.id = stamp + userid + suffix
-            results.extend(rows)
+def fill_item_id(data: GachaData, index: ItemIdIndex = None) -> tuple[int, int]:
+    """
+    根据物品名称查询 item_id ，并补充到数据集中。
+
+    每个 (名称, 语言) 只查询一次，结果应用到所有同名物品上。
+    按物品自身的语言查询不到时，会再按数据集的语言查询一次。
 
-        data[gacha_type] = results
+    :param data: 祈愿数据集。
+    :param index: 物品查询表。默认使用随包附带的查询表。
+    :return: 两个整数。前者是缺失 ``item_id`` 的祈愿记录的总数，后者是补充了 ``item_id`` 的记录总数。
+    """
+    if index is None:
+        with ItemIdIndex() as index:
+            return fill_item_id(data, index)
+
+    resolved: dict[tuple[str, str], str | None] = {}
+    rows_total_broken = 0
+    rows_total_effected = 0
+
+    for rows in data.values():
+        for row in rows:
+            item = row.item
+            if item.id:
+                continue
+            rows_total_broken += 1
+            key = item.name, item.language
+            if key not in resolved:
+                resolved[key] = index.lookup(item.name, item.language)
+                if resolved[key] is None and data.language and data.language != item.language:
+                    resolved[key] = index.lookup(item.name, data.language)
+            if resolved[key] is not None:
+                item.id = resolved[key]
+                rows_total_effected += 1
 
     return rows_total_broken, rows_total_effected
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+GWK 压缩包。根据文件后缀和文件头识别压缩格式，并透明地进行压缩和解压。
+
+支持 gzip(``.gz``)、bzip2(``.bz2``)、xz(``.xz``)、lzma(``.lzma``)，
+以及安装了 `zstandard <https://pypi.org/project/zstandard/>`_ 之后的 zstd(``.zst``)。
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    'CodecUnavailable',
+    'DECOMPRESSION_ERRORS',
+    'SUFFIXES',
+    'detect',
+    'sniff',
+    'split_suffix',
+    'open_file',
+    'open_stream',
+]
+
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+from typing import IO
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SUFFIXES = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.lzma': 'lzma',
+    '.zst': 'zstd',
+}
+"""
+压缩文件后缀与压缩格式的映射。
+"""
+
+MAGICS = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+"""
+文件头与压缩格式的映射。lzma 格式没有可靠的文件头，只能通过后缀识别。
+"""
+
+DECOMPRESSION_ERRORS: tuple[type[Exception], ...] = (
+    EOFError,
+    OSError,
+    lzma.LZMAError,
+) + ((zstandard.ZstdError,) if zstandard else ())
+"""
+解压损坏的文件时可能抛出的异常。
+"""
+
+
+class CodecUnavailable(Exception):
+    """
+    压缩格式所需的可选依赖包没有安装。
+    """
+
+    def __init__(self, codec: str, package: str):
+        self.codec = codec
+        self.package = package
+
+    def __str__(self):
+        return f'处理 {self.codec} 压缩的文件需要先安装 {self.package} 。'
+
+
+def split_suffix(fp: Path | str) -> tuple[str, str | None]:
+    """
+    拆分文件后缀。
+
+    >>> split_suffix('a.json.gz')  # ('.json', 'gzip')
+    >>> split_suffix('a.json')  # ('.json', None)
+
+    :return: 去掉压缩后缀之后的文件后缀，以及压缩格式（未压缩时为 None）。
+    """
+    fp = Path(fp)
+    codec = SUFFIXES.get(fp.suffix.lower())
+    if codec is None:
+        return fp.suffix, None
+    return Path(fp.stem).suffix, codec
+
+
+def sniff(head: bytes) -> str | None:
+    """
+    通过文件头识别压缩格式。
+
+    :param head: 文件开头的若干字节，至少 6 个字节才能识别所有格式。
+    :return: 压缩格式，未压缩或无法识别时为 None 。
+    """
+    for magic, codec in MAGICS:
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def detect(fp: Path | str) -> str | None:
+    """
+    通过文件头（以及必要时通过后缀）识别文件的压缩格式。
+
+    :return: 压缩格式，未压缩时为 None 。
+    """
+    with open(fp, 'rb') as f:
+        codec = sniff(f.read(6))
+    if codec is not None:
+        return codec
+    if Path(fp).suffix.lower() == '.lzma':
+        return 'lzma'
+    return None
+
+
+def open_file(
+        fp: Path | str,
+        mode: str = 'rt',
+        encoding: str = None,
+        level: int = None,
+        newline: str = None,
+) -> IO:
+    """
+    打开一个可能被压缩的文件。
+
+    读取时根据文件头识别压缩格式；写入时根据文件后缀决定压缩格式。
+
+    :param fp: 文件地址。
+    :param mode: 与 ``open()`` 相同，但只允许 r、w、a、x 加上 t 或 b 。
+    :param encoding: 字符编码。仅用于文本模式。
+    :param level: 压缩等级。仅用于写入，省略时使用压缩格式自己的默认值。
+    :param newline: 与 ``open()`` 相同。仅用于文本模式。
+    :raise CodecUnavailable: 压缩格式所需的依赖包没有安装。
+    """
+    reading = 'r' in mode
+    codec = detect(fp) if reading else split_suffix(fp)[1]
+    if 'b' not in mode and 't' not in mode:
+        mode += 't'
+
+    if codec is None:
+        return open(fp, mode, encoding=encoding, newline=newline)
+    if codec == 'gzip':
+        return gzip.open(fp, mode, encoding=encoding, newline=newline, **({} if reading or level is None else {'compresslevel': level}))
+    if codec == 'bz2':
+        return bz2.open(fp, mode, encoding=encoding, newline=newline, **({} if reading or level is None else {'compresslevel': level}))
+    if codec in ('xz', 'lzma'):
+        if reading:
+            return lzma.open(fp, mode, encoding=encoding, newline=newline)
+        return lzma.open(
+            fp, mode,
+            format=lzma.FORMAT_XZ if codec == 'xz' else lzma.FORMAT_ALONE,
+            preset=level,
+            encoding=encoding,
+            newline=newline,
+        )
+    if codec == 'zstd':
+        if zstandard is None:
+            raise CodecUnavailable(codec, 'zstandard')
+        if reading:
+            return zstandard.open(fp, mode, encoding=encoding, newline=newline)
+        cctx = zstandard.ZstdCompressor(**({} if level is None else {'level': level}))
+        return zstandard.open(fp, mode, cctx=cctx, encoding=encoding, newline=newline)
+    raise CodecUnavailable(codec, codec)  # pragma: no cover
+
+
+def open_stream(fileobj: IO[bytes]) -> IO[bytes]:
+    """
+    为已经打开的二进制流套上解压层。通过文件头识别压缩格式，因此不支持 lzma 格式。
+
+    :param fileobj: 可读的二进制流。
+    :return: 解压后的二进制流，关闭它不会关闭 ``fileobj`` 。未压缩时原样返回（或套上一层缓冲）。
+    :raise CodecUnavailable: 压缩格式所需的依赖包没有安装。
+    """
+    if not hasattr(fileobj, 'peek'):
+        fileobj = io.BufferedReader(fileobj)
+    codec = sniff(fileobj.peek(6)[:6])
+    if codec is None:
+        return fileobj
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if codec == 'bz2':
+        return bz2.BZ2File(fileobj, 'rb')
+    if codec == 'xz':
+        return lzma.LZMAFile(fileobj, 'rb')
+    if codec == 'zstd':
+        if zstandard is None:
+            raise CodecUnavailable(codec, 'zstandard')
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+    raise CodecUnavailable(codec, codec)  # pragma: no cover
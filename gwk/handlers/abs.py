@@ -5,9 +5,14 @@
 
 from __future__ import annotations
 
+from datetime import datetime
 from pathlib import Path
+from typing import IO, Iterable, Iterator
 
-from gwk.models import GachaData
+from gwk.compression import split_suffix
+from gwk.constants import GachaType
+from gwk.models import GachaData, Record
+from gwk.watermarks import Watermarks
 
 
 class HandlingException(Exception):
@@ -26,18 +31,36 @@ class SingleGachaFileHandler:
     abstract = True
     supports: list[str] = []
     description: str = ''
+    binary = False  # 为 True 时，read_from() 等方法读写的是二进制流而不是文本流
+    streaming = False  # 为 True 时，祈愿记录逐行存储，转换时可以边读边写，不必先放入 data
+    newline: str = None  # 以文本模式打开文件时传给 open() 的 newline 参数
 
     data: GachaData = GachaData()
     rows_total_read = 0  # 读取文件后，进入读取祈愿记录的循环时开始计数
     rows_total_loaded = 0  # 将对象放入 data 之后计一个数
+    rows_total_skipped = 0  # 因为不晚于水位线而跳过的记录数，这些记录不计入 rows_total_loaded
+
+    watermarks: Watermarks = None  # 增量转换时的水位线，不晚于水位线的记录在创建对象之前就会被跳过
+
+    def __init__(self):
+        # 每个处理器各自持有一份数据集，以免同一进程内的多次转换互相污染
+        self.data = GachaData()
+
+    def is_new(self, types: GachaType, time: datetime, rid: str | None, uid: str | None) -> bool:
+        """
+        判断一条已经解析出字段、但还没有创建对象的祈愿记录是否晚于水位线。不晚于水位线时计入 ``.rows_total_skipped`` 。
+        """
+        if self.watermarks is None or self.watermarks.admits(types, time, rid, uid):
+            return True
+        self.rows_total_skipped += 1
+        return False
 
     def is_supported(self, fp: Path | str) -> bool:
         """
-        快速（初步）判断当前处理器是否支持读取指定类型的文件。
+        快速（初步）判断当前处理器是否支持读取指定类型的文件。压缩文件按去掉压缩后缀之后的后缀判断。
         """
-        if not isinstance(fp, Path):
-            fp = Path(fp)
-        return fp.suffix in self.supports
+        suffix, _ = split_suffix(fp)
+        return suffix in self.supports
 
     def write(
             self,
@@ -62,3 +85,31 @@ class SingleGachaFileHandler:
         从文件中读取数据。
         """
         raise NotImplementedError
+
+    def write_to(self, f: IO[str], *args, **kwargs):
+        """
+        将数据写入到已经打开的文本流中。
+        """
+        raise NotImplementedError
+
+    def write_records(self, records: Iterable[Record], f: IO[str], *args, **kwargs):
+        """
+        将祈愿记录逐条写入到已经打开的文本流中。
+
+        默认先把所有记录放入 ``.data`` 再调用 ``.write_to()`` ，能够边读边写的处理器应当重写此方法。
+        """
+        for record in records:
+            self.data[record.types].append(record)
+        self.write_to(f, *args, **kwargs)
+
+    def read_from(self, f: IO[str], *args, **kwargs):
+        """
+        从已经打开的文本流中读取数据。
+        """
+        raise NotImplementedError
+
+    def iter_read(self, f: IO[str], *args, **kwargs) -> Iterator[Record]:
+        """
+        从已经打开的文本流中读取文件信息，并返回一个逐条读取祈愿记录的迭代器。
+        """
+        raise NotImplementedError
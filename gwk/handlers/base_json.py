@@ -6,8 +6,11 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
+from typing import IO, Iterator
 
+from gwk.compression import CodecUnavailable, DECOMPRESSION_ERRORS, open_file
 from gwk.handlers.abs import HandlingException, SingleGachaFileHandler
+from gwk.models import Record
 
 
 class UnsupportedFormat(HandlingException):
@@ -33,22 +36,37 @@ class SingleGachaJsonHandler(SingleGachaFileHandler):
             fp: Path | str = None,
             encoding='UTF-8',
             minimum=True,
+            level: int = None,
             *args,
             **kwargs
     ):
         """
-        将 ``.dump()``  生成的数据写入到JSON文件中。
+        将 ``.dump()``  生成的数据写入到JSON文件中。文件后缀是压缩格式时会压缩后写入。
 
         :param fp: 文件地址。
         :param encoding: 字符编码。默认是 UTF-8 。
         :param minimum: 是否以最简格式写入（去除格式上的所有空格）。
+        :param level: 压缩等级。仅在写入压缩文件时有效。
         """
-        with open(fp, 'w', encoding=encoding) as f:
-            data = self.dump()
-            if minimum:
-                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
-            else:
-                json.dump(data, f, ensure_ascii=False)
+        try:
+            f = open_file(fp, 'w', encoding=encoding, level=level)
+        except CodecUnavailable as e:
+            raise UnsupportedFormat(str(e))
+        with f:
+            self.write_to(f, minimum)
+
+    def write_to(self, f: IO[str], minimum=True, *args, **kwargs):
+        """
+        将 ``.dump()``  生成的数据写入到已经打开的文本流中。
+
+        :param f: 文本流。
+        :param minimum: 是否以最简格式写入（去除格式上的所有空格）。
+        """
+        data = self.dump()
+        if minimum:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(data, f, ensure_ascii=False)
 
     def dump(self) -> dict:
         """
@@ -58,29 +76,84 @@ class SingleGachaJsonHandler(SingleGachaFileHandler):
 
     def read(self, fp: Path | str, encoding='UTF-8', *args, **kwargs):
         """
-        从JSON文件中读取数据，并调用 ``.load()`` 进行解析。
+        从JSON文件中读取数据，并调用 ``.load()`` 进行解析。压缩文件会自动解压。
 
         :param fp: 文件地址。
         :param encoding: 字符编码。默认是 UTF-8 。
         :raise HandlingException: 解析异常。
         """
+        self.load(self.decode_file(fp, encoding))
+
+    def read_from(self, f: IO[str], *args, **kwargs):
+        """
+        从已经打开的文本流中读取数据，并调用 ``.load()`` 进行解析。
+
+        :raise HandlingException: 解析异常。
+        """
+        self.load(self.decode(f))
+
+    def iter_read(self, f: IO[str], *args, **kwargs) -> Iterator[Record]:
+        """
+        从已经打开的文本流中读取数据，并调用 ``.iter_load()`` 进行解析。
+
+        :raise HandlingException: 解析异常。
+        """
+        raw = self.decode(f)
+        self.rows_total_read = 0
+        self.rows_total_loaded = 0
+        self.rows_total_skipped = 0
+        return self.iter_load(raw)
+
+    def decode_file(self, fp: Path | str, encoding='UTF-8') -> dict:
+        """
+        解码JSON文件。压缩文件会自动解压。
+
+        :raise UnsupportedFormat: 不是JSON文件，或主体不是一个对象。
+        """
+        try:
+            f = open_file(fp, 'r', encoding=encoding)
+        except CodecUnavailable as e:
+            raise UnsupportedFormat(str(e))
+        with f:
+            return self.decode(f)
+
+    @staticmethod
+    def decode(f: IO[str]) -> dict:
+        """
+        解码JSON文本流。
+
+        :raise UnsupportedFormat: 不是JSON文件，或主体不是一个对象。
+        """
         try:
-            with open(fp, 'r', encoding=encoding) as f:
-                raw = json.load(f)
+            raw = json.load(f)
         except json.JSONDecodeError:
             raise UnsupportedFormat('文件解析失败，可能不是JSON文件，或文件有损坏。')
         except UnicodeError:
-            raise UnsupportedFormat(f'使用 {encoding} 读取时发生Unicode相关编码错误。')
+            raise UnsupportedFormat(f'使用 {getattr(f, "encoding", None)} 读取时发生Unicode相关编码错误。')
+        except DECOMPRESSION_ERRORS:
+            raise UnsupportedFormat('文件解压失败，可能不是压缩文件，或文件有损坏。')
 
         if not isinstance(raw, dict):
             raise UnsupportedFormat('JSON文件主体应当是一个对象。')
+        return raw
 
+    def load(self, raw: dict):
+        """
+        从原始数据中解析并读取数据。原始数据可以是 ``.decode_file()`` 的结果，因此已经解码的文件不必再读取一次。
+        """
         self.rows_total_read = 0
         self.rows_total_loaded = 0
-        self.load(raw)
+        self.rows_total_skipped = 0
+        for record in self.iter_load(raw):
+            self.data[record.types].append(record)
+        self.data.sort()
 
-    def load(self, raw: dict):
+    def iter_load(self, raw: dict) -> Iterator[Record]:
         """
-        从原始数据中解析并读取数据。
+        校验原始数据并读取文件信息，然后返回一个逐条解析祈愿记录的迭代器。
+
+        文件信息会立即写入 ``.data`` ，而祈愿记录只在迭代时才会解析，并且不会放入 ``.data`` 。
+
+        :raise HandlingException: 原始数据缺少必要的字段。
         """
         raise NotImplementedError
@@ -5,12 +5,18 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Iterator
 
 from gwk.constants import DATETIME_FORMAT, GachaType
 from gwk.handlers.base_json import MissingField, SingleGachaJsonHandler
 from gwk.models import Item, Record
 from gwk.utils import purify
 
+TYPE_MAP = tuple((t.value, t.label) for t in GachaType)
+"""
+导出文件中 ``typeMap`` 字段的内容，即卡池类型与卡池名称的对照表。
+"""
+
 
 class BiuuuJsonHandler(SingleGachaJsonHandler):
     """
@@ -26,7 +32,7 @@ class BiuuuJsonHandler(SingleGachaJsonHandler):
             'uid': self.data.uid,
             'lang': self.data.language,
             'time': int(self.data.exported_at.timestamp() * 1000),
-            'typeMap': [[t.value, t.label] for t in GachaType],
+            'typeMap': TYPE_MAP,
             'result': [
                 [
                     gt.uigf_type,
@@ -55,7 +61,7 @@ class BiuuuJsonHandler(SingleGachaJsonHandler):
                 int(record.item.rank_type),
             ]
 
-    def load(self, raw: dict):
+    def iter_load(self, raw: dict) -> Iterator[Record]:
 
         if 'uid' not in raw or not isinstance(raw['uid'], str):
             raise MissingField('uid', '玩家游戏ID', '字符串')
@@ -76,41 +82,79 @@ class BiuuuJsonHandler(SingleGachaJsonHandler):
         pools: list = raw['result']
 
         # 每个 pool 都是一个 [gacha_type, [...]]
+        tasks = []
         for pool in pools:
             try:
                 gt, rows, *_ = pool
-                gt = GachaType(gt)
+                gt = GachaType.lookup(gt)
             except ValueError:
                 continue
+            if not isinstance(rows, list):
+                continue
+            tasks.append((rows, gt, self.data.uid))
+
+        return self.iter_rows(tasks)
 
+    def iter_rows(self, tasks: list[tuple]) -> Iterator[Record]:
+        for rows, default_gacha_type, uid in tasks:
             for row in rows:
                 self.rows_total_read += 1
                 try:
-                    record = self.parse_row(row, gt)
+                    fields = parse_fields(row, default_gacha_type, uid)
                 except:
                     continue
-                self.data[record.types].append(record)
+                if not self.is_new(fields[0], fields[1], fields[5], fields[6]):
+                    continue
                 self.rows_total_loaded += 1
-
-        self.data.sort()
+                yield make_record(*fields)
 
     def parse_row(self, row: list, default_gacha_type: GachaType) -> Record:
-        if len(row) >= 6:
-            time, name, item_type, rank_type, gacha_type, rid, *_ = row
-        else:
-            time, name, item_type, rank_type, *_ = row
-            gacha_type = default_gacha_type
-            rid = ''
-
-        item = Item(
-            name=str(name),
-            item_type=str(item_type),
-            rank_type=str(rank_type),
-        )
-        return Record(
-            types=GachaType(gacha_type),
-            time=datetime.strptime(time, DATETIME_FORMAT),
-            item=item,
-            id=rid,
-            uid=self.data.uid,
-        )
+        return make_record(*parse_fields(row, default_gacha_type, self.data.uid))
+
+
+def parse_fields(row: list, default_gacha_type: GachaType, uid: str) -> tuple:
+    """
+    将一条祈愿记录解析成 ``make_record()`` 所需的参数。
+
+    :param row: 祈愿记录。
+    :param default_gacha_type: 记录所在卡池的类型。仅在记录本身没有卡池类型时使用。
+    :param uid: 玩家ID。
+    """
+    if len(row) >= 6:
+        time, name, item_type, rank_type, gacha_type, rid, *_ = row
+    else:
+        time, name, item_type, rank_type, *_ = row
+        gacha_type = default_gacha_type
+        rid = ''
+    return (
+        GachaType.lookup(gacha_type),
+        datetime.strptime(time, DATETIME_FORMAT),
+        str(name),
+        str(item_type),
+        str(rank_type),
+        rid,
+        uid,
+    )
+
+
+def make_record(
+        types: GachaType,
+        time: datetime,
+        name: str,
+        item_type: str,
+        rank_type: str,
+        rid: str,
+        uid: str,
+) -> Record:
+    item = Item(
+        name=name,
+        item_type=item_type,
+        rank_type=rank_type,
+    )
+    return Record(
+        types=types,
+        time=time,
+        item=item,
+        id=rid,
+        uid=uid,
+    )
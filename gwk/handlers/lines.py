@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+逐行存储祈愿记录的文件（NDJSON、CSV）的处理器。
+
+每一行是一条祈愿记录，字段与 ``UigfJsonHandler.dump_record()`` 相同。文件没有单独的文件信息，
+玩家ID和语言取自第一条记录。读写都是边读边写，并且支持追加到已有的文件末尾。
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from itertools import chain
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+from gwk.compression import CodecUnavailable, DECOMPRESSION_ERRORS, open_file
+from gwk.handlers.abs import SingleGachaFileHandler
+from gwk.handlers.base_json import UnsupportedFormat
+from gwk.handlers.uigf import COLUMNS, REQUIRED_FIELDS, UigfJsonHandler, make_record, parse_fields
+from gwk.models import Record
+
+ROWS_PER_WRITE = 1000
+
+END = object()
+"""
+``.iter_raw()`` 没有任何一行时 ``next()`` 返回的默认值，与无法解码的行（None）区分开。
+"""
+
+
+class SingleGachaLinesHandler(SingleGachaFileHandler):
+    """
+    逐行存储祈愿记录的文件的处理器抽象类。子类需要实现 ``.write_records()`` 和 ``.iter_raw()`` 。
+    """
+    streaming = True
+
+    dump_record = staticmethod(UigfJsonHandler.dump_record)
+
+    def write(
+            self,
+            fp: Path | str = None,
+            encoding='UTF-8',
+            level: int = None,
+            *args,
+            **kwargs
+    ):
+        """
+        将数据写入到文件中。文件后缀是压缩格式时会压缩后写入。
+
+        :param fp: 文件地址。
+        :param encoding: 字符编码。默认是 UTF-8 。
+        :param level: 压缩等级。仅在写入压缩文件时有效。
+        """
+        self.write_file(
+            (record for records in self.data.values() for record in records),
+            fp, encoding, level,
+        )
+
+    def write_file(
+            self,
+            records: Iterable[Record],
+            fp: Path | str,
+            encoding='UTF-8',
+            level: int = None,
+            append=False,
+    ):
+        """
+        将祈愿记录逐条写入到文件中。
+
+        :param records: 祈愿记录。
+        :param fp: 文件地址。
+        :param encoding: 字符编码。默认是 UTF-8 。
+        :param level: 压缩等级。仅在写入压缩文件时有效。
+        :param append: 是否追加到文件末尾。
+        """
+        # 追加到非空文件时不应该再写入表头之类的内容
+        continued = append and Path(fp).exists() and Path(fp).stat().st_size > 0
+        try:
+            f = open_file(fp, 'a' if append else 'w', encoding=encoding, level=level, newline=self.newline)
+        except CodecUnavailable as e:
+            raise UnsupportedFormat(str(e))
+        with f:
+            self.write_records(records, f, continued=continued)
+
+    def write_to(self, f: IO[str], *args, **kwargs):
+        self.write_records(
+            (record for records in self.data.values() for record in records),
+            f, *args, **kwargs,
+        )
+
+    def write_records(self, records: Iterable[Record], f: IO[str], continued=False, *args, **kwargs):
+        """
+        边整理边写入祈愿记录。
+
+        :param continued: 是否接在已有的内容之后写入（例如追加到非空文件时），此时不会写入表头之类的内容。
+        """
+        raise NotImplementedError
+
+    def read(self, fp: Path | str, encoding='UTF-8', *args, **kwargs):
+        """
+        从文件中读取数据。压缩文件会自动解压。
+
+        :raise HandlingException: 解析异常。
+        """
+        try:
+            f = open_file(fp, 'r', encoding=encoding, newline=self.newline)
+        except CodecUnavailable as e:
+            raise UnsupportedFormat(str(e))
+        with f:
+            self.read_from(f)
+
+    def read_from(self, f: IO[str], *args, **kwargs):
+        for record in self.iter_read(f):
+            self.data[record.types].append(record)
+        self.data.sort()
+
+    def iter_read(self, f: IO[str], *args, **kwargs) -> Iterator[Record]:
+        """
+        读取并解析第一条祈愿记录，将它的玩家ID和语言作为文件信息，然后返回一个逐行解析祈愿记录的迭代器。
+
+        :raise HandlingException: 第一条记录无法解码或解析，即文件很可能不是当前格式。
+        """
+        self.rows_total_read = 0
+        self.rows_total_loaded = 0
+        self.rows_total_skipped = 0
+        try:
+            rows = self.iter_raw(f)
+            first = next(rows, END)
+            if first is None:
+                raise ValueError('第一行无法解码')
+            record = self.parse_row(first) if first is not END else None
+        except UnicodeError:
+            raise UnsupportedFormat(f'使用 {getattr(f, "encoding", None)} 读取时发生Unicode相关编码错误。')
+        except DECOMPRESSION_ERRORS:
+            raise UnsupportedFormat('文件解压失败，可能不是压缩文件，或文件有损坏。')
+        except Exception:
+            raise UnsupportedFormat('第一条祈愿记录解析失败，可能不是当前格式的文件。')
+
+        if record is None:
+            return iter(())
+        self.data.uid = record.uid
+        self.data.language = record.item.language
+        return self.iter_rows(chain([first], rows))
+
+    def iter_rows(self, rows: Iterator[dict | None]) -> Iterator[Record]:
+        """
+        逐条解析祈愿记录。无法解码或解析的行计入读取的记录数，但不会产出。
+
+        :raise UnsupportedFormat: 读到中途时解压失败或发生编码错误（例如文件被截断）。
+        """
+        try:
+            for row in rows:
+                self.rows_total_read += 1
+                if row is None:
+                    continue
+                try:
+                    fields = parse_fields(row, self.data.uid)
+                except:
+                    continue
+                if not self.is_new(fields[0], fields[1], fields[6], fields[7]):
+                    continue
+                self.rows_total_loaded += 1
+                yield self.make_record(row, fields)
+        except UnicodeError:
+            raise UnsupportedFormat('读取时发生Unicode相关编码错误。')
+        except DECOMPRESSION_ERRORS:
+            raise UnsupportedFormat('文件解压失败，可能文件不完整或有损坏。')
+
+    def iter_raw(self, f: IO[str]) -> Iterator[dict | None]:
+        """
+        逐行解码，得到尚未解析的祈愿记录。无法解码的行产出 None 。
+
+        :raise Exception: 文件整体无法解码（如表头不正确）时可以抛出任何异常，视为文件不是当前格式。
+        """
+        raise NotImplementedError
+
+    def parse_row(self, row: dict) -> Record:
+        return self.make_record(row, parse_fields(row, self.data.uid))
+
+    @staticmethod
+    def make_record(row: dict, fields: tuple) -> Record:
+        """
+        根据 ``parse_fields()`` 的结果创建祈愿记录，并保留原始记录中的 item_id 。
+        """
+        record = make_record(*fields)
+        if row.get('item_id'):
+            record.item.id = str(row['item_id'])
+        return record
+
+
+class NdjsonHandler(SingleGachaLinesHandler):
+    """
+    `NDJSON <https://github.com/ndjson/ndjson-spec>`_ （JSON Lines）格式文件处理器。每行是一个JSON对象。
+    """
+    abstract = False
+    supports: list[str] = ['.ndjson', '.jsonl']
+    description = (
+        '每行一条祈愿记录的JSON Lines格式（NDJSON）处理器，字段与UIGF.J相同。'
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+    def write_records(self, records: Iterable[Record], f: IO[str], continued=False, *args, **kwargs):
+        buffer = []
+        for record in records:
+            buffer.append(self.encode(self.dump_record(record)))
+            if len(buffer) >= ROWS_PER_WRITE:
+                f.write('\n'.join(buffer) + '\n')
+                buffer.clear()
+        if buffer:
+            f.write('\n'.join(buffer) + '\n')
+
+    def iter_raw(self, f: IO[str]) -> Iterator[dict | None]:
+        for line in f:
+            if line.isspace():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            yield row if isinstance(row, dict) else None
+
+
+class CsvHandler(SingleGachaLinesHandler):
+    """
+    CSV格式文件处理器。第一行是列名，之后每行一条祈愿记录。
+    """
+    abstract = False
+    supports: list[str] = ['.csv']
+    newline = ''  # csv 模块要求，否则带引号的字段中的换行会被改写
+    description = (
+        '每行一条祈愿记录的CSV格式处理器，第一行是列名，列与UIGF.J的字段相同。'
+    )
+
+    def write_records(self, records: Iterable[Record], f: IO[str], continued=False, *args, **kwargs):
+        writer = csv.writer(f, lineterminator='\n')
+        if not continued:
+            writer.writerow(COLUMNS)
+        buffer = []
+        for record in records:
+            buffer.append(self.dump_record(record).values())
+            if len(buffer) >= ROWS_PER_WRITE:
+                writer.writerows(buffer)
+                buffer.clear()
+        writer.writerows(buffer)
+
+    def iter_raw(self, f: IO[str]) -> Iterator[dict | None]:
+        reader = csv.reader(f)
+        columns = next(reader, None)
+        if columns is None:
+            return
+        if not REQUIRED_FIELDS <= set(columns):
+            raise ValueError(columns)
+        while True:
+            try:
+                values = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                yield None
+                continue
+            if not values:
+                continue
+            # 空单元格视为缺少该字段，以便使用默认值
+            yield {k: v for k, v in zip(columns, values) if v}
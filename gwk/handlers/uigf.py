@@ -5,11 +5,16 @@
 
 from __future__ import annotations
 
+import json
 from collections import defaultdict
 from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterable, Iterator
 
+from gwk.compression import CodecUnavailable, open_file
 from gwk.constants import DATETIME_FORMAT, GachaType
-from gwk.handlers.base_json import MissingField, SingleGachaJsonHandler
+from gwk.handlers.abs import HandlingException
+from gwk.handlers.base_json import MissingField, SingleGachaJsonHandler, UnsupportedFormat
 from gwk.models import Item, Record
 from gwk.utils import purify
 
@@ -29,45 +34,77 @@ class UigfJsonHandler(SingleGachaJsonHandler):
     exporter_version: str = None
 
     def dump(self) -> dict:
-        now = datetime.now()
         return {
-            'info': {
-                'uid': self.data.uid or '',
-                'lang': self.data.language or 'zh-cn',
-                'export_time': (self.data.exported_at or now).strftime(DATETIME_FORMAT),
-                'export_timestamp': int((self.data.exported_at or now).timestamp()),
-                'export_app': self.exporter_name or '',
-                'export_app_version': self.exporter_version or '',
-                'uigf_version': self.versions[-1],
-            },
+            'info': self.dump_info(),
             'list': [
-                {
-                    "uid": record.uid,
-                    "gacha_type": record.types.value,
-                    "item_id": record.item.id,
-                    "count": str(record.count),
-                    "time": record.time.strftime(DATETIME_FORMAT),
-                    "name": record.item.name,
-                    "lang": record.item.language,
-                    "item_type": record.item.item_type,
-                    "rank_type": str(record.item.rank_type),
-                    "id": record.id,
-                    "uigf_gacha_type": record.types.uigf_type,
-                }
+                self.dump_record(record)
                 for types, records in self.data.items()
                 for record in records
             ],
         }
 
-    def load(self, raw: dict):
+    def dump_info(self) -> dict:
+        now = datetime.now()
+        return {
+            'uid': self.data.uid or '',
+            'lang': self.data.language or 'zh-cn',
+            'export_time': (self.data.exported_at or now).strftime(DATETIME_FORMAT),
+            'export_timestamp': int((self.data.exported_at or now).timestamp()),
+            'export_app': self.exporter_name or '',
+            'export_app_version': self.exporter_version or '',
+            'uigf_version': self.versions[-1],
+        }
+
+    @staticmethod
+    def dump_record(record: Record) -> dict:
+        return {
+            "uid": record.uid,
+            "gacha_type": record.types.value,
+            "item_id": record.item.id,
+            "count": str(record.count or 1),
+            "time": record.time.strftime(DATETIME_FORMAT),
+            "name": record.item.name,
+            "lang": record.item.language,
+            "item_type": record.item.item_type,
+            "rank_type": str(record.item.rank_type),
+            "id": record.id,
+            "uigf_gacha_type": record.types.uigf_type,
+        }
+
+    def write_to(self, f: IO[str], minimum=True, *args, **kwargs):
+        self.write_records(
+            (record for records in self.data.values() for record in records),
+            f, minimum,
+        )
+
+    def write_records(self, records: Iterable[Record], f: IO[str], minimum=True, *args, **kwargs):
+        """
+        边整理边写入，不会在内存中生成完整的 ``.dump()`` 。输出与 ``json.dump(self.dump())`` 完全相同。
+        """
+        item_sep, key_sep = (',', ':') if minimum else (', ', ': ')
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(item_sep, key_sep)).encode
+        f.write(f'{{"info"{key_sep}{encode(self.dump_info())}{item_sep}"list"{key_sep}[')
+        for i, record in enumerate(records):
+            if i:
+                f.write(item_sep)
+            f.write(encode(self.dump_record(record)))
+        f.write(']}')
 
+    def iter_load(self, raw: dict) -> Iterator[Record]:
+        self.load_info(raw)
+        return self.iter_rows(raw['list'])
+
+    def load_info(self, raw: dict):
+        """
+        校验原始数据的结构，并读取文件信息。
+
+        :raise MissingField: 缺少 info 或 list 字段。
+        """
         if 'info' not in raw or not isinstance(raw['info'], dict):
             raise MissingField('info', '存放文件信息', '对象')
         if 'list' not in raw or not isinstance(raw['list'], list):
             raise MissingField('list', '存放祈愿记录', '数组')
 
-        # --------------------------------
-
         headers = defaultdict(lambda: None, raw['info'])
 
         self.data.uid = purify(headers['uid'], str)
@@ -78,22 +115,75 @@ class UigfJsonHandler(SingleGachaJsonHandler):
         self.exporter_name = purify(headers['export_app'])
         self.exporter_version = purify(headers['export_app_version'])
 
-        # --------------------------------
+    def passthrough(
+            self,
+            raw: dict,
+            ofp: Path | str,
+            encoding='UTF-8',
+            minimum=True,
+            level: int = None,
+    ):
+        """
+        直通转换：只改写文件信息（ ``uigf_version`` 、 ``export_app`` 等），祈愿记录经过粗略校验后原样写出，
+        不会解析成 ``Record`` 。适用于源格式与目标格式都是 UIGF.J 且不需要修复祈愿记录的情况。
 
-        rows: list = raw['list']
+        与完整转换不同，祈愿记录不会补全缺省字段，也不会重新排序。失败时可以把同一份原始数据交给 ``.load()`` 进行完整转换。
 
+        :param raw: 源文件的原始数据，即 ``.decode_file()`` 的结果。
+        :param ofp: 目标文件地址。可以与源文件相同。
+        :param encoding: 字符编码。默认是 UTF-8 。
+        :param minimum: 是否以最简格式写入（去除格式上的所有空格）。
+        :param level: 压缩等级。仅在写入压缩文件时有效。
+        :raise HandlingException: 不是 UIGF.J 文件，或者有祈愿记录不能通过校验（此时应当改用完整转换）。
+        """
+        # 导出软件应当是当前处理器的设置，而不是源文件中的值
+        exporter = self.exporter_name, self.exporter_version
+        self.load_info(raw)
+        self.exporter_name, self.exporter_version = exporter
+
+        rows = raw['list']
+        self.rows_total_read = len(rows)
+        for row in rows:
+            if not is_valid_row(row):
+                raise InvalidRow(row)
+        self.rows_total_loaded = len(rows)
+
+        try:
+            f = open_file(ofp, 'w', encoding=encoding, level=level)
+        except CodecUnavailable as e:
+            raise UnsupportedFormat(str(e))
+        with f:
+            self.write_raw(raw, f, minimum)
+
+    def write_raw(self, raw: dict, f: IO[str], minimum=True):
+        """
+        写出原始数据。文件信息按 ``.dump_info()`` 改写（源文件中其它的字段会保留），祈愿记录原样写出。
+        """
+        item_sep, key_sep = (',', ':') if minimum else (', ', ': ')
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(item_sep, key_sep)).encode
+        info = {**raw['info'], **self.dump_info()}
+
+        rows = raw['list']
+        f.write(f'{{"info"{key_sep}{encode(info)}{item_sep}"list"{key_sep}[')
+        # 分块编码，既能用上 C 实现的编码器，又不会一次生成整个文件的字符串
+        for i in range(0, len(rows), 10000):
+            if i:
+                f.write(item_sep)
+            f.write(encode(rows[i:i + 10000])[1:-1])
+        f.write(']}')
+
+    def iter_rows(self, rows: list) -> Iterator[Record]:
+        uid = self.data.uid
         for row in rows:
             self.rows_total_read += 1
-            if not isinstance(row, dict):
-                continue
             try:
-                record = self.parse_row(row)
+                fields = parse_fields(row, uid)
             except:
                 continue
-            self.data[record.types].append(record)
+            if not self.is_new(fields[0], fields[1], fields[6], fields[7]):
+                continue
             self.rows_total_loaded += 1
-
-        self.data.sort()
+            yield make_record(*fields)
 
     @staticmethod
     def parse_export_time(headers: dict) -> datetime | None:
@@ -108,20 +198,94 @@ class UigfJsonHandler(SingleGachaJsonHandler):
         return None
 
     def parse_row(self, row: dict) -> Record:
-        item = Item(
-            name=str(row['name']),
-            item_type=str(row['item_type']),
-            rank_type=str(row['rank_type']),
-        )
-        if 'lang' in row:
-            item.language = str(row['lang'])
-
-        record = Record(
-            types=GachaType(row['gacha_type']),
-            time=datetime.strptime(row['time'], DATETIME_FORMAT),
-            item=item,
-            id=row['id'] if 'id' in row else None,
-            uid=row['uid'] if 'uid' in row else self.data.uid,
-            count=int(row['count']) if 'count' in row else None,
-        )
-        return record
+        return make_record(*parse_fields(row, self.data.uid))
+
+
+COLUMNS = (
+    'uid', 'gacha_type', 'item_id', 'count', 'time', 'name',
+    'lang', 'item_type', 'rank_type', 'id', 'uigf_gacha_type',
+)
+"""
+每条祈愿记录的字段，与 ``UigfJsonHandler.dump_record()`` 的字段相同。
+"""
+
+REQUIRED_FIELDS = frozenset(('gacha_type', 'time', 'name', 'item_type', 'rank_type'))
+
+
+class InvalidRow(HandlingException):
+
+    def __init__(self, row):
+        self.row = row
+        self.msg = f'祈愿记录 {row!r} 缺少必要字段，或字段的值不正确。'
+
+
+def is_valid_row(row) -> bool:
+    """
+    粗略校验一条祈愿记录：必要字段齐全、卡池类型存在、时间的长度正确。不会真正解析时间。
+    """
+    return (
+            isinstance(row, dict)
+            and REQUIRED_FIELDS <= row.keys()
+            and row['gacha_type'] in GachaType
+            and isinstance(row['time'], str)
+            and len(row['time']) == 19
+    )
+
+
+def parse_time(text: str) -> datetime:
+    """
+    按 ``DATETIME_FORMAT`` 解析时间。
+
+    ``datetime.strptime()`` 是解析祈愿记录时最慢的一步，因此符合格式的文本改用快得多的 ``datetime.fromisoformat()`` 。
+    """
+    if len(text) == 19 and text[10] == ' ' and text[4] == text[7] == '-' and text[13] == text[16] == ':':
+        return datetime.fromisoformat(text)
+    return datetime.strptime(text, DATETIME_FORMAT)
+
+
+def parse_fields(row: dict, uid: str) -> tuple:
+    """
+    将一条祈愿记录解析成 ``make_record()`` 所需的参数。
+
+    :param row: 祈愿记录。
+    :param uid: 记录中没有 uid 时使用的玩家ID。
+    """
+    return (
+        GachaType.lookup(row['gacha_type']),
+        parse_time(row['time']),
+        str(row['name']),
+        str(row['item_type']),
+        str(row['rank_type']),
+        str(row['lang']) if 'lang' in row else None,
+        row['id'] if 'id' in row else None,
+        row['uid'] if 'uid' in row else uid,
+        int(row['count']) if 'count' in row else None,
+    )
+
+
+def make_record(
+        types: GachaType,
+        time: datetime,
+        name: str,
+        item_type: str,
+        rank_type: str,
+        language: str | None,
+        rid: str | None,
+        uid: str,
+        count: int | None,
+) -> Record:
+    item = Item(
+        name=name,
+        item_type=item_type,
+        rank_type=rank_type,
+    )
+    if language is not None:
+        item.language = language
+    return Record(
+        types=types,
+        time=time,
+        item=item,
+        id=rid,
+        uid=uid,
+        count=count,
+    )
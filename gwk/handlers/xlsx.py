@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+面向 `统一可交换祈愿记录标准(UIGF) <https://github.com/DGP-Studio/Snap.Genshin/wiki/StandardFormat>`_ 字段的 Excel 工作簿（.xlsx）处理器。
+
+只使用标准库：写入时把工作表的XML逐行写入 ``zipfile`` 的条目中，读取时用 ``iterparse`` 逐行解析，
+因此内存占用与记录数无关。
+"""
+
+from __future__ import annotations
+
+import io
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import defaultdict
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+from xml.etree.ElementTree import iterparse, ParseError
+from xml.sax.saxutils import escape
+
+from gwk.compression import split_suffix
+from gwk.constants import GachaType
+from gwk.handlers.abs import SingleGachaFileHandler
+from gwk.handlers.base_json import UnsupportedFormat
+from gwk.handlers.uigf import COLUMNS, UigfJsonHandler, make_record, parse_fields
+from gwk.models import Record
+from gwk.utils import purify
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+INFO_SHEET = 'info'
+"""
+存放文件信息的工作表的名称。其它工作表都存放祈愿记录，每个卡池类型一张。
+"""
+
+ROWS_PER_WRITE = 1000
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{overrides}'
+    '</Types>'
+)
+SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<Relationships xmlns="{NS_PKG_REL}">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_REL}"><sheets>{{sheets}}</sheets></workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<Relationships xmlns="{NS_PKG_REL}">{{rels}}</Relationships>'
+)
+SHEET_RELS = (
+    '<Relationship Id="rId{n}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<worksheet xmlns="{NS_MAIN}"><sheetData>'
+).encode('UTF-8')
+SHEET_TAIL = b'</sheetData></worksheet>'
+
+# XML 1.0 不允许出现的控制字符
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def xml_row(values: Iterable) -> str:
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(ILLEGAL_XML_CHARS.sub("", str(v)))}</t></is></c>'
+        for v in values
+    )
+    return f'<row>{cells}</row>'
+
+
+def column_index(ref: str) -> int:
+    """
+    将单元格引用（例如 ``AB12``）的列转换成从 0 开始的序号。
+    """
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+class UigfXlsxHandler(SingleGachaFileHandler):
+    """
+    使用 `统一可交换祈愿记录标准(UIGF) <https://github.com/DGP-Studio/Snap.Genshin/wiki/StandardFormat>`_ 字段的 Excel 工作簿处理器。
+
+    第一张工作表 ``info`` 按 “字段, 值” 存放文件信息，其余工作表每个卡池类型一张，第一行是列名。
+    """
+    abstract = False
+    binary = True
+    supports: list[str] = ['.xlsx']
+    versions = UigfJsonHandler.versions
+    description = (
+        '使用统一可交换祈愿记录标准字段的Excel工作簿（.xlsx）处理器。'
+    )
+
+    version: str = None
+    exporter_name: str = None
+    exporter_version: str = None
+
+    dump_info = UigfJsonHandler.dump_info
+    dump_record = staticmethod(UigfJsonHandler.dump_record)
+    parse_export_time = staticmethod(UigfJsonHandler.parse_export_time)
+
+    def is_supported(self, fp: Path | str) -> bool:
+        """
+        工作簿本身就是 ZIP 压缩的，不支持 ``.xlsx.gz`` 之类再压缩一层的文件。
+        """
+        suffix, codec = split_suffix(fp)
+        return codec is None and suffix in self.supports
+
+    @staticmethod
+    def check_suffix(fp: Path | str):
+        """
+        :raise UnsupportedFormat: 文件后缀带有压缩格式。
+        """
+        if split_suffix(fp)[1] is not None:
+            raise UnsupportedFormat(f'工作簿本身已经是压缩格式，不支持 {Path(fp).name} 这样再压缩一层的文件。')
+
+    # --------------------------------
+    # 写入
+
+    def write(self, fp: Path | str = None, encoding='UTF-8', level: int = None, *args, **kwargs):
+        """
+        将数据写入到工作簿中。
+
+        :param fp: 文件地址。
+        :param encoding: 不使用。工作簿始终使用 UTF-8 编码。
+        :param level: ZIP 的压缩等级（0~9）。
+        :raise UnsupportedFormat: 文件后缀带有压缩格式。
+        """
+        self.check_suffix(fp)
+        with open(fp, 'wb') as f:
+            self.write_to(f, level)
+
+    def write_to(self, f: IO[bytes], level: int = None, *args, **kwargs):
+        self.write_sheets(
+            f,
+            [(gt, (self.dump_record(record) for record in records)) for gt, records in self.data.items()],
+            level,
+        )
+
+    def write_records(self, records: Iterable[Record], f: IO[bytes], level: int = None, *args, **kwargs):
+        """
+        逐条写入祈愿记录。
+
+        ZIP 同一时间只能写入一个条目，因此各卡池的行会先暂存到临时文件中（较小时留在内存里），最后依次写入工作簿。
+        """
+        spools: dict[GachaType, tempfile.SpooledTemporaryFile] = {}
+        try:
+            for record in records:
+                spool = spools.get(record.types)
+                if spool is None:
+                    spool = spools[record.types] = tempfile.SpooledTemporaryFile(1 << 20)
+                spool.write(xml_row(self.dump_record(record).values()).encode('UTF-8'))
+            for spool in spools.values():
+                spool.seek(0)
+            self.write_sheets(f, list(spools.items()), level)
+        finally:
+            for spool in spools.values():
+                spool.close()
+
+    def write_sheets(self, f: IO[bytes], sheets: list[tuple[GachaType, Iterable]], level: int = None):
+        """
+        写入工作簿。
+
+        :param f: 可写的二进制流，不要求可以 seek 。
+        :param sheets: 若干个 (卡池类型, 行) 。行可以是 ``.dump_record()`` 的返回值，也可以是已经生成好XML的二进制流。
+        :param level: ZIP 的压缩等级（0~9）。
+        """
+        names = [INFO_SHEET, *(gt.label for gt, _ in sheets)]
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
+            zf.writestr('[Content_Types].xml', CONTENT_TYPES.format(
+                overrides=''.join(SHEET_CONTENT_TYPE.format(n=n) for n in range(1, len(names) + 1))
+            ))
+            zf.writestr('_rels/.rels', ROOT_RELS)
+            zf.writestr('xl/workbook.xml', WORKBOOK.format(sheets=''.join(
+                f'<sheet name="{escape(name)}" sheetId="{n}" r:id="rId{n}"/>'
+                for n, name in enumerate(names, 1)
+            )))
+            zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS.format(
+                rels=''.join(SHEET_RELS.format(n=n) for n in range(1, len(names) + 1))
+            ))
+
+            with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+                sheet.write(SHEET_HEAD)
+                sheet.write(''.join(xml_row(pair) for pair in self.dump_info().items()).encode('UTF-8'))
+                sheet.write(SHEET_TAIL)
+
+            for n, (_, rows) in enumerate(sheets, 2):
+                with zf.open(f'xl/worksheets/sheet{n}.xml', 'w', force_zip64=True) as sheet:
+                    sheet.write(SHEET_HEAD)
+                    sheet.write(xml_row(COLUMNS).encode('UTF-8'))
+                    if hasattr(rows, 'read'):
+                        shutil.copyfileobj(rows, sheet)
+                    else:
+                        buffer = []
+                        for row in rows:
+                            buffer.append(xml_row(row.values()))
+                            if len(buffer) >= ROWS_PER_WRITE:
+                                sheet.write(''.join(buffer).encode('UTF-8'))
+                                buffer.clear()
+                        sheet.write(''.join(buffer).encode('UTF-8'))
+                    sheet.write(SHEET_TAIL)
+
+    # --------------------------------
+    # 读取
+
+    def read(self, fp: Path | str, encoding='UTF-8', *args, **kwargs):
+        """
+        从工作簿中读取数据。
+
+        :param fp: 文件地址。
+        :param encoding: 不使用。
+        :raise HandlingException: 解析异常。
+        """
+        self.check_suffix(fp)
+        with open(fp, 'rb') as f:
+            self.read_from(f)
+
+    def read_from(self, f: IO[bytes], *args, **kwargs):
+        for record in self.iter_read(f):
+            self.data[record.types].append(record)
+        self.data.sort()
+
+    def iter_read(self, f: IO[bytes], *args, **kwargs) -> Iterator[Record]:
+        """
+        读取文件信息，并返回一个逐行解析祈愿记录的迭代器。
+
+        :raise HandlingException: 不是工作簿，或缺少 ``info`` 工作表。
+        """
+        if not (hasattr(f, 'seekable') and f.seekable()):
+            f = io.BytesIO(f.read())
+        try:
+            zf = zipfile.ZipFile(f)
+            sheets = self.parse_workbook(zf)
+        except (zipfile.BadZipFile, KeyError, ParseError):
+            raise UnsupportedFormat('文件解析失败，可能不是xlsx文件，或文件有损坏。')
+        if INFO_SHEET not in sheets:
+            raise UnsupportedFormat(f'工作簿中缺少名为 {INFO_SHEET} 的工作表。')
+
+        strings = self.parse_shared_strings(zf)
+        headers = defaultdict(lambda: None)
+        for row in self.iter_sheet(zf, sheets.pop(INFO_SHEET), strings):
+            if len(row) >= 2 and row[0]:
+                headers[row[0]] = row[1]
+
+        self.data.uid = purify(headers['uid'], str)
+        self.data.language = purify(headers['lang'])
+        self.data.exported_at = self.parse_export_time(headers)
+
+        self.version = purify(headers['uigf_version'])
+        self.exporter_name = purify(headers['export_app'])
+        self.exporter_version = purify(headers['export_app_version'])
+
+        self.rows_total_read = 0
+        self.rows_total_loaded = 0
+        self.rows_total_skipped = 0
+        return self.iter_rows(zf, list(sheets.values()), strings)
+
+    def iter_rows(self, zf: zipfile.ZipFile, entries: list[str], strings: list[str]) -> Iterator[Record]:
+        with zf:
+            for entry in entries:
+                rows = self.iter_sheet(zf, entry, strings)
+                columns = next(rows, [])
+                for row in rows:
+                    self.rows_total_read += 1
+                    try:
+                        fields = parse_fields(dict(zip(columns, row)), self.data.uid)
+                    except:
+                        continue
+                    if not self.is_new(fields[0], fields[1], fields[6], fields[7]):
+                        continue
+                    self.rows_total_loaded += 1
+                    yield make_record(*fields)
+
+    @staticmethod
+    def parse_workbook(zf: zipfile.ZipFile) -> dict[str, str]:
+        """
+        :return: 工作表名称 → 工作表在 ZIP 中的路径。
+        """
+        targets = {}
+        for _, el in iterparse(zf.open('xl/_rels/workbook.xml.rels')):
+            if el.tag == f'{{{NS_PKG_REL}}}Relationship':
+                target = el.get('Target', '')
+                targets[el.get('Id')] = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+        sheets = {}
+        for _, el in iterparse(zf.open('xl/workbook.xml')):
+            if el.tag == f'{{{NS_MAIN}}}sheet':
+                sheets[el.get('name')] = targets[el.get(f'{{{NS_REL}}}id')]
+        return sheets
+
+    @staticmethod
+    def parse_shared_strings(zf: zipfile.ZipFile) -> list[str]:
+        """
+        读取共享字符串表。由本处理器写入的工作簿没有这个表，但经过 Excel 另存之后就会有。
+        """
+        try:
+            stream = zf.open('xl/sharedStrings.xml')
+        except KeyError:
+            return []
+        strings = []
+        for _, el in iterparse(stream):
+            if el.tag == f'{{{NS_MAIN}}}si':
+                strings.append(''.join(t.text or '' for t in el.iter(f'{{{NS_MAIN}}}t')))
+                el.clear()
+        return strings
+
+    @staticmethod
+    def iter_sheet(zf: zipfile.ZipFile, entry: str, strings: list[str]) -> Iterator[list[str]]:
+        """
+        逐行读取工作表，每一行都是字符串列表。
+        """
+        tag_data, tag_row, tag_c, tag_v, tag_t = (f'{{{NS_MAIN}}}{t}' for t in ('sheetData', 'row', 'c', 'v', 't'))
+        parent = None
+        for event, el in iterparse(zf.open(entry), ('start', 'end')):
+            if event == 'start':
+                if el.tag == tag_data:
+                    parent = el
+                continue
+            if el.tag != tag_row:
+                continue
+            row = []
+            for c in el:
+                if c.tag != tag_c:
+                    continue
+                ref = c.get('r')
+                if ref:
+                    row.extend([''] * (column_index(ref) - len(row)))
+                kind = c.get('t')
+                if kind == 'inlineStr':
+                    value = ''.join(t.text or '' for t in c.iter(tag_t))
+                else:
+                    v = c.find(tag_v)
+                    value = v.text or '' if v is not None else ''
+                    if kind == 's':
+                        value = strings[int(value)]
+                row.append(value)
+            # 解析完的行要从 sheetData 中移除，否则内存占用会随行数增长
+            if parent is not None:
+                parent.clear()
+            yield row
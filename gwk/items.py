@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+GWK 物品包。主要包含 物品名称 → item_id 的查询表。
+
+查询表是一个预先排好序的二进制文件，使用时才以内存映射（mmap）的方式打开，并通过二分查找进行查询，
+不需要在导入时解析，也不会把整张表读入内存。
+
+文件结构（小端序）::
+
+    头部    magic(4s) 格式版本(H) 保留(H) 数据版本(16s) 条目数(I) 字符串区偏移(I)
+    条目区  条目数 × [ 键偏移(I) 键长度(H) 保留(H) item_id(I) ]，按键的字节序排列
+    字符串区 所有键，键为 UTF-8 编码的 “语言\\0名称”
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    'DEFAULT_INDEX',
+    'IndexFormatError',
+    'ItemIdIndex',
+    'build_index',
+]
+
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+DEFAULT_INDEX = Path(__file__).parent / 'data' / 'item_ids.bin'
+"""
+随包附带的查询表，由同目录下的数据文件 ``items.json`` 生成::
+
+    python gwk.py update-items gwk/data/items.json
+"""
+
+MAGIC = b'GWKI'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHH16sII')
+ENTRY = struct.Struct('<IHHI')
+
+
+class IndexFormatError(Exception):
+    """
+    查询表或其数据源的格式不正确。
+    """
+
+    def __init__(self, msg: str):
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
+
+
+def make_key(name: str, language: str) -> bytes:
+    return f'{language.lower()}\0{name}'.encode('UTF-8')
+
+
+class ItemIdIndex:
+    """
+    物品名称 → item_id 的查询表。
+
+    >>> index = ItemIdIndex()
+    >>> index.lookup('芭芭拉', 'zh-cn')  # '10000014'
+    >>> index.lookup('Barbara', 'en-us')  # '10000014'
+    """
+
+    def __init__(self, fp: Path | str = DEFAULT_INDEX):
+        self.fp = Path(fp)
+        self._file = None
+        self._mm: mmap.mmap | None = None
+        self._version = ''
+        self._count = 0
+        self._blob = 0
+
+    def open(self):
+        """
+        打开并校验查询表。通常不需要手动调用，首次查询时会自动打开。
+
+        :raise IndexFormatError: 文件不是查询表，或格式版本不受支持。
+        """
+        if self._mm is not None:
+            return
+        f = open(self.fp, 'rb')
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件无法映射
+            f.close()
+            raise IndexFormatError(f'{self.fp.name} 不是物品查询表。')
+        if len(mm) < HEADER.size:
+            mm.close()
+            f.close()
+            raise IndexFormatError(f'{self.fp.name} 不是物品查询表。')
+        magic, fmt, _, version, count, blob = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            mm.close()
+            f.close()
+            raise IndexFormatError(f'{self.fp.name} 不是物品查询表，或格式版本不受支持。')
+        self._file, self._mm = f, mm
+        self._version = version.rstrip(b'\0').decode('ASCII')
+        self._count = count
+        self._blob = blob
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self):
+        self.open()
+        return self._count
+
+    @property
+    def version(self) -> str:
+        """
+        数据版本。通常是数据对应的游戏版本号。
+        """
+        self.open()
+        return self._version
+
+    def _key_at(self, i: int) -> tuple[bytes, int]:
+        offset, length, _, item_id = ENTRY.unpack_from(self._mm, HEADER.size + i * ENTRY.size)
+        start = self._blob + offset
+        return self._mm[start:start + length], item_id
+
+    def lookup(self, name: str, language: str = 'zh-cn') -> str | None:
+        """
+        查询物品的 item_id 。
+
+        :param name: 物品名称。
+        :param language: 名称所用的语言，与 ``Item.language`` 相同。
+        :return: item_id ，找不到时返回 None 。
+        """
+        self.open()
+        key = make_key(name, language)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k, item_id = self._key_at(mid)
+            if k < key:
+                lo = mid + 1
+            elif k > key:
+                hi = mid
+            else:
+                return str(item_id)
+        return None
+
+
+def build_index(source: Path | str, fp: Path | str = DEFAULT_INDEX) -> tuple[str, int]:
+    """
+    从本地数据文件生成查询表。
+
+    数据文件是一个JSON对象，``items`` 字段按语言存放 名称 → item_id 的映射::
+
+        {
+            "version": "2.8",
+            "items": {
+                "zh-cn": {"芭芭拉": 10000014},
+                "en-us": {"Barbara": 10000014}
+            }
+        }
+
+    :param source: 数据文件地址。
+    :param fp: 查询表的保存地址。默认覆盖随包附带的查询表。
+    :return: 数据版本和条目总数。
+    :raise IndexFormatError: 数据文件格式不正确。
+    """
+    with open(source, 'r', encoding='UTF-8') as f:
+        try:
+            raw = json.load(f)
+        except json.JSONDecodeError:
+            raise IndexFormatError('数据文件不是JSON文件，或文件有损坏。')
+    if not isinstance(raw, dict) or not isinstance(raw.get('items'), dict):
+        raise IndexFormatError('数据文件缺少存放物品的 items 字段，或该字段的值不是一个 对象 。')
+    version = str(raw.get('version', ''))
+    if len(version.encode('ASCII', 'replace')) > 16:
+        raise IndexFormatError('数据版本不能超过16个字符。')
+
+    pairs: dict[bytes, int] = {}
+    for language, names in raw['items'].items():
+        if not isinstance(names, dict):
+            raise IndexFormatError(f'items 中 {language} 的值不是一个 对象 。')
+        for name, item_id in names.items():
+            try:
+                pairs[make_key(name, language)] = int(item_id)
+            except (TypeError, ValueError):
+                raise IndexFormatError(f'{language} 中 {name} 的 item_id 不是整数。')
+
+    keys = sorted(pairs)
+    blob = HEADER.size + len(keys) * ENTRY.size
+    # 先写到临时文件再替换，以免破坏其它进程正在映射的查询表
+    temp = Path(f'{fp}.tmp')
+    with open(temp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, version.encode('ASCII', 'replace'), len(keys), blob))
+        offset = 0
+        for key in keys:
+            f.write(ENTRY.pack(offset, len(key), 0, pairs[key]))
+            offset += len(key)
+        for key in keys:
+            f.write(key)
+    os.replace(temp, fp)
+    return version, len(keys)
@@ -5,11 +5,17 @@ GWK 模型包。主要包含对数据的抽象得到的模型类。
 
 from __future__ import annotations
 
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from gwk.constants import GachaType
 
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
 
 @dataclass
 class Item:
@@ -36,6 +42,112 @@ class Record:
     uid: str = ''
 
 
+def time_key(time: datetime) -> int:
+    """
+    将祈愿时间转换成可以放进 ``array('q')`` 的整数（微秒），保持先后顺序不变。
+    """
+    return (time - EPOCH) // MICROSECOND
+
+
+class RecordsView(Sequence):
+    """
+    某个卡池中一段连续（按时间排序后）的祈愿记录的只读视图。不会复制记录，但原数据集变化后视图的内容也会随之变化。
+    """
+
+    def __init__(self, records: list[Record], order: array | None, start: int, stop: int):
+        """
+        :param records: 卡池的祈愿记录。
+        :param order: 按时间排序后的第 i 条记录在 ``records`` 中的位置。为 None 表示 ``records`` 本身已经有序。
+        :param start: 起始位置（按时间排序后），包含。
+        :param stop: 结束位置（按时间排序后），不包含。
+        """
+        self._records = records
+        self._order = order
+        self._start = start
+        self._stop = max(start, stop)
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return RecordsView(self._records, self._order, self._start + start, self._start + stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('view index out of range')
+        position = self._start + index
+        return self._records[position if self._order is None else self._order[position]]
+
+    def __iter__(self):
+        if self._order is None:
+            for position in range(self._start, self._stop):
+                yield self._records[position]
+        else:
+            for position in range(self._start, self._stop):
+                yield self._records[self._order[position]]
+
+    def __repr__(self):
+        return f'<{type(self).__name__} of {len(self)} records>'
+
+
+class PoolIndex:
+    """
+    单个卡池的索引：按时间排序的时间数组（用于二分查找），以及各个星级的前缀计数。
+    """
+
+    def __init__(self, records: list[Record]):
+        self.records = records
+        self.length = len(records)
+
+        keys = [time_key(r.time) for r in records]
+        if all(keys[i] <= keys[i + 1] for i in range(len(keys) - 1)):
+            self.order = None
+        else:
+            self.order = array('q', sorted(range(len(keys)), key=keys.__getitem__))
+            keys = [keys[i] for i in self.order]
+        self.keys = array('q', keys)
+
+        # 星级 → 前 i 条（按时间排序后）中该星级的记录数
+        self.ranks: dict[str, array] = {}
+        for position in range(self.length):
+            rank = str(self.record(position).item.rank_type)
+            if rank not in self.ranks:
+                self.ranks[rank] = array('q', bytes(8 * (self.length + 1)))
+            self.ranks[rank][position + 1] = 1
+        for counts in self.ranks.values():
+            for i in range(1, len(counts)):
+                counts[i] += counts[i - 1]
+
+    def is_valid(self, records: list[Record]) -> bool:
+        return records is self.records and len(records) == self.length
+
+    def record(self, position: int) -> Record:
+        return self.records[position if self.order is None else self.order[position]]
+
+    def view(self, start: int, stop: int) -> RecordsView:
+        return RecordsView(self.records, self.order, max(start, 0), min(stop, self.length))
+
+    def locate(self, start: datetime | None, end: datetime | None) -> tuple[int, int]:
+        """
+        :return: 时间在 [start, end) 内的记录的位置范围。
+        """
+        return (
+            0 if start is None else bisect_left(self.keys, time_key(start)),
+            self.length if end is None else bisect_left(self.keys, time_key(end)),
+        )
+
+    def count_by_rank(self, start: int, stop: int) -> dict[str, int]:
+        return {
+            rank: counts[stop] - counts[start]
+            for rank, counts in self.ranks.items()
+            if counts[stop] > counts[start]
+        }
+
+
 class GachaData(dict[GachaType, list[Record]]):
     """
     包含所有卡池的所有祈愿记录（抽卡记录）的类。
@@ -52,6 +164,15 @@ class GachaData(dict[GachaType, list[Record]]):
         """
         return r.time
 
+    def copy_info(self, other: GachaData):
+        """
+        复制另一个数据集的文件信息（玩家ID、地区、语言、导出时间），不复制祈愿记录。
+        """
+        self.uid = other.uid
+        self.region = other.region
+        self.language = other.language
+        self.exported_at = other.exported_at
+
     @property
     def total(self) -> int:
         return sum(len(value) for value in self.values())
@@ -64,3 +185,111 @@ class GachaData(dict[GachaType, list[Record]]):
     def sort(self):
         for gacha_type in self:
             self[gacha_type].sort(key=self.key_)
+        self.invalidate()
+
+    # --------------------------------
+    # 索引与查询
+    #
+    # 索引在第一次查询时才建立。卡池被替换成另一个列表，或者记录数发生变化时，会自动重建该卡池的索引；
+    # 直接修改记录的 time 、 id 或星级，或者原地重新排列记录之后，需要调用 .invalidate() 。
+
+    def invalidate(self):
+        """
+        丢弃所有索引，下次查询时重新建立。
+        """
+        self.__dict__.pop('_pools', None)
+        self.__dict__.pop('_ids', None)
+
+    def pool_index(self, types: GachaType) -> PoolIndex:
+        """
+        获取卡池的索引，必要时（重新）建立。
+        """
+        records = super().get(types)
+        if records is None:
+            # 不要像 [] 运算符那样顺便创建空卡池，否则会改变导出的内容
+            return PoolIndex([])
+        pools: dict[GachaType, PoolIndex] = self.__dict__.setdefault('_pools', {})
+        index = pools.get(types)
+        if index is None or not index.is_valid(records):
+            index = pools[types] = PoolIndex(records)
+        return index
+
+    def id_index(self) -> dict[str, tuple[GachaType, int]]:
+        """
+        获取 祈愿记录ID → (卡池类型, 按时间排序后的位置) 的映射，必要时（重新）建立。
+        """
+        pools = {types: self.pool_index(types) for types in self}
+        cached = self.__dict__.get('_ids')
+        if cached is not None and cached[0] == pools:
+            return cached[1]
+        ids = {
+            str(index.record(position).id): (types, position)
+            for types, index in pools.items()
+            for position in range(index.length)
+            if index.record(position).id
+        }
+        self.__dict__['_ids'] = pools, ids
+        return ids
+
+    def between(
+            self,
+            start: datetime = None,
+            end: datetime = None,
+            types: GachaType = None,
+    ) -> RecordsView | dict[GachaType, RecordsView]:
+        """
+        查询时间在 [start, end) 内的祈愿记录。
+
+        :param start: 起始时间，包含。为 None 表示不限。
+        :param end: 结束时间，不包含。为 None 表示不限。
+        :param types: 卡池类型。为 None 时查询所有卡池。
+        :return: 按时间排序的视图；不指定卡池类型时是 卡池类型 → 视图 ，只包含有记录的卡池。
+        """
+        if types is not None:
+            index = self.pool_index(types)
+            return index.view(*index.locate(start, end))
+        views = {types: self.between(start, end, types) for types in list(self)}
+        return {types: view for types, view in views.items() if view}
+
+    def around_id(self, rid: str, n: int = 5) -> RecordsView:
+        """
+        查询某条祈愿记录，以及同一卡池中按时间排在它前后的各 ``n`` 条记录。
+
+        :raise KeyError: 祈愿记录不存在。
+        """
+        types, position = self.id_index()[str(rid)]
+        return self.pool_index(types).view(position - n, position + n + 1)
+
+    def latest(self, n: int, types: GachaType = None) -> RecordsView | dict[GachaType, RecordsView]:
+        """
+        查询最近的 ``n`` 条祈愿记录。
+
+        :param types: 卡池类型。为 None 时分别查询每个卡池。
+        :return: 按时间排序的视图；不指定卡池类型时是 卡池类型 → 视图 ，只包含有记录的卡池。
+        """
+        if types is not None:
+            index = self.pool_index(types)
+            return index.view(index.length - max(n, 0), index.length)
+        views = {types: self.latest(n, types) for types in list(self)}
+        return {types: view for types, view in views.items() if view}
+
+    def count_by_rank(
+            self,
+            types: GachaType = None,
+            start: datetime = None,
+            end: datetime = None,
+    ) -> dict[str, int]:
+        """
+        统计时间在 [start, end) 内的祈愿记录中每个星级的数量。
+
+        :param types: 卡池类型。为 None 时统计所有卡池。
+        :return: 星级 → 数量，不包含数量为 0 的星级。
+        """
+        if types is not None:
+            index = self.pool_index(types)
+            return index.count_by_rank(*index.locate(start, end))
+        total: dict[str, int] = {}
+        for types in list(self):
+            for rank, count in self.count_by_rank(types, start, end).items():
+                total[rank] = total.get(rank, 0) + count
+        return total
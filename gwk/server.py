@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+GWK 服务包。提供一个只依赖标准库的本地HTTP转换服务。
+
+- ``POST /convert?writer=UigfJson[&reader=BiuuuJson]`` ：请求体是任意支持的格式（可以是压缩过的），响应体是转换后的文件。
+- ``GET /metrics`` ：Prometheus 文本格式的统计数据。
+
+解析和转换在有上限的进程池中进行；同时进行的转换数和请求体大小都有上限，超出时分别返回 503 和 413 ，
+并且不会读取请求体。请求体和转换结果都经由临时文件在进程之间传递，服务进程只分块收发，不会整个放进内存。
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    'Metrics',
+    'ConversionServer',
+    'ConversionRequestHandler',
+    'convert_file',
+]
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from urllib.parse import parse_qs, urlsplit
+
+from gwk.api import find_handler, iter_records, write_records
+from gwk.handlers.abs import HandlingException
+
+CONTENT_TYPES = {
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.csv': 'text/csv; charset=utf-8',
+    '.ndjson': 'application/x-ndjson',
+}
+"""
+处理器的首选后缀 → 响应的 Content-Type 。其余的都是 application/json 。
+"""
+
+CHUNK_SIZE = 1 << 16
+"""
+收发请求体和响应体时每次读写的字节数。
+"""
+
+
+def convert_file(ifp: str, ofp: str, writer: str, reader: str = None) -> int:
+    """
+    转换一个文件。可以在子进程中调用。
+
+    源文件按内容自动识别格式（不依赖后缀），目标文件按 ``writer`` 写入（不会根据后缀压缩）。
+
+    :param ifp: 源文件地址。
+    :param ofp: 目标文件地址。
+    :param writer: 目标格式处理器的名称。
+    :param reader: 源格式处理器的名称。若不提供则自动识别。
+    :return: 转换的记录数。
+    :raise HandlingException: 转换失败。
+    """
+    with open(ifp, 'rb') as source, open(ofp, 'wb') as output:
+        with iter_records(source, reader) as records:
+            write_records(records, output, writer)
+        return records.handler.rows_total_loaded
+
+
+class Metrics:
+    """
+    线程安全的服务统计数据。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: dict[int, int] = {}  # 状态码 → 请求数
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.rows_total = 0
+        self.converting_seconds = 0.0
+        self.jobs_in_flight = 0
+
+    def observe(self, status: int, latency: float):
+        with self._lock:
+            self.requests[status] = self.requests.get(status, 0) + 1
+            self.latency_sum += latency
+            self.latency_count += 1
+
+    def converted(self, rows: int, seconds: float):
+        with self._lock:
+            self.rows_total += rows
+            self.converting_seconds += seconds
+
+    def job(self, delta: int):
+        with self._lock:
+            self.jobs_in_flight += delta
+
+    def render(self) -> str:
+        """
+        输出 Prometheus 文本格式的统计数据。
+        """
+        with self._lock:
+            lines = [
+                '# TYPE gwk_requests_total counter',
+                *(f'gwk_requests_total{{status="{status}"}} {count}'
+                  for status, count in sorted(self.requests.items())),
+                '# TYPE gwk_request_duration_seconds summary',
+                f'gwk_request_duration_seconds_sum {self.latency_sum:.6f}',
+                f'gwk_request_duration_seconds_count {self.latency_count}',
+                '# TYPE gwk_rows_converted_total counter',
+                f'gwk_rows_converted_total {self.rows_total}',
+                '# TYPE gwk_converting_seconds_total counter',
+                f'gwk_converting_seconds_total {self.converting_seconds:.6f}',
+                '# TYPE gwk_rows_per_second gauge',
+                f'gwk_rows_per_second {self.rows_total / self.converting_seconds if self.converting_seconds else 0:.3f}',
+                '# TYPE gwk_jobs_in_flight gauge',
+                f'gwk_jobs_in_flight {self.jobs_in_flight}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    server: ConversionServer
+    protocol_version = 'HTTP/1.1'
+
+    def send_head(self, status: HTTPStatus, length: int, content_type: str, **headers):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        for name, value in headers.items():
+            self.send_header(name.replace('_', '-'), value)
+        self.end_headers()
+        self.status = status
+
+    def reply(self, status: HTTPStatus, body: bytes | str = b'', content_type='text/plain; charset=utf-8', **headers):
+        if isinstance(body, str):
+            body = body.encode('UTF-8')
+        self.send_head(status, len(body), content_type, **headers)
+        self.wfile.write(body)
+
+    def reply_file(self, status: HTTPStatus, fp: str, content_type: str, **headers):
+        """
+        分块发送文件作为响应体。
+        """
+        with open(fp, 'rb') as f:
+            self.send_head(status, os.fstat(f.fileno()).st_size, content_type, **headers)
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def reject(self, status: HTTPStatus, body: str, **headers):
+        """
+        不读取请求体，直接拒绝请求并关闭连接。
+        """
+        self.reply(status, body, Connection='close', **headers)
+        self.close_connection = True
+
+    def receive(self, f, length: int) -> bool:
+        """
+        分块读取请求体并写入到文件中。
+
+        :return: 是否完整读取了 ``length`` 字节。
+        """
+        while length > 0:
+            chunk = self.rfile.read(min(length, CHUNK_SIZE))
+            if not chunk:
+                return False
+            f.write(chunk)
+            length -= len(chunk)
+        return True
+
+    def handle_one_request(self):
+        self.status = None
+        start = time.perf_counter()
+        super().handle_one_request()
+        if self.status is not None:
+            self.server.metrics.observe(self.status, time.perf_counter() - start)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/metrics':
+            self.reply(HTTPStatus.OK, self.server.metrics.render(), 'text/plain; version=0.0.4; charset=utf-8')
+        else:
+            self.reply(HTTPStatus.NOT_FOUND, '路径不存在。')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/convert':
+            self.reject(HTTPStatus.NOT_FOUND, '路径不存在。')
+            return
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        writer, reader = query.get('writer'), query.get('reader')
+        if not writer:
+            self.reject(HTTPStatus.BAD_REQUEST, '缺少参数 writer 。')
+            return
+        try:
+            for name in filter(None, (writer, reader)):
+                find_handler(name)
+        except HandlingException as e:
+            self.reject(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.reject(HTTPStatus.LENGTH_REQUIRED, '缺少请求头 Content-Length 。')
+            return
+        if length > self.server.max_size:
+            self.reject(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f'请求体不能超过 {self.server.max_size} 字节。')
+            return
+
+        # 先占用转换名额再读取请求体，被拒绝的请求不会占用内存和磁盘
+        if not self.server.slots.acquire(blocking=False):
+            self.reject(HTTPStatus.SERVICE_UNAVAILABLE, '转换任务太多，请稍后重试。', Retry_After='1')
+            return
+        self.server.metrics.job(+1)
+        ifd, ifp = tempfile.mkstemp(prefix='gwk-')
+        ofd, ofp = tempfile.mkstemp(prefix='gwk-')
+        os.close(ofd)
+        try:
+            # 转换结束后先归还名额再回复，客户端收到响应时名额一定已经空出来了
+            try:
+                rows = self.convert(ifd, ifp, ofp, length, writer, reader)
+            finally:
+                self.server.metrics.job(-1)
+                self.server.slots.release()
+        except EOFError as e:
+            self.reject(HTTPStatus.BAD_REQUEST, str(e))
+        except HandlingException as e:
+            self.reply(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+        except Exception as e:
+            self.log_error('转换失败：%r', e)
+            self.reply(HTTPStatus.INTERNAL_SERVER_ERROR, '转换时发生未知错误。')
+        else:
+            content_type = CONTENT_TYPES.get(find_handler(writer).supports[0], 'application/json')
+            self.reply_file(HTTPStatus.OK, ofp, content_type, X_Rows_Converted=str(rows))
+        finally:
+            os.unlink(ifp)
+            os.unlink(ofp)
+
+    def convert(self, ifd: int, ifp: str, ofp: str, length: int, writer: str, reader: str = None) -> int:
+        """
+        将请求体写入到 ``ifd`` 中，然后在进程池中转换到 ``ofp`` 。
+
+        :return: 转换的记录数。
+        :raise EOFError: 请求体不完整。
+        :raise HandlingException: 无法转换请求体。
+        """
+        with open(ifd, 'wb') as f:
+            if not self.receive(f, length):
+                raise EOFError('请求体不完整。')
+        start = time.perf_counter()
+        rows = self.server.pool.submit(convert_file, ifp, ofp, writer, reader).result()
+        self.server.metrics.converted(rows, time.perf_counter() - start)
+        return rows
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """
+    本地HTTP转换服务。
+
+    >>> with ConversionServer(('127.0.0.1', 0)) as server:
+    >>>     threading.Thread(target=server.serve_forever, daemon=True).start()
+    >>>     print(server.server_address)  # ('127.0.0.1', 54321)
+    """
+    daemon_threads = True
+
+    def __init__(
+            self,
+            address: tuple[str, int],
+            workers: int = 2,
+            max_jobs: int = None,
+            max_size: int = 64 << 20,
+            handler_class: type[BaseHTTPRequestHandler] = ConversionRequestHandler,
+    ):
+        """
+        :param address: 监听的地址和端口。端口为 0 时自动分配。
+        :param workers: 进程池的进程数。进程以 spawn 方式启动，不会从处理请求的线程中 fork 。
+        :param max_jobs: 同时进行的转换数上限。默认是进程数的两倍。
+        :param max_size: 请求体的字节数上限。
+        """
+        super().__init__(address, handler_class)
+        self.pool = ProcessPoolExecutor(max(1, workers), mp_context=get_context('spawn'))
+        self.slots = threading.BoundedSemaphore(max_jobs or max(1, workers) * 2)
+        self.max_size = max_size
+        self.metrics = Metrics()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True, cancel_futures=True)
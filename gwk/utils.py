@@ -12,6 +12,7 @@ __all__ = [
 ]
 
 import enum
+from types import MappingProxyType
 from typing import Any, TypeVar
 
 T = TypeVar('T')
@@ -77,42 +78,84 @@ class ItemsMeta(enum.EnumMeta):
         cls = super().__new__(metacls, classname, bases, classdict, **kwds)
         for member, pvs in zip(cls.__members__.values(), pvs_list):
             member.__dict__.update(zip(pks, pvs))
-
-        return enum.unique(cls)
+        cls = enum.unique(cls)
+
+        # 预先生成只读的查询表：枚举值 → 枚举成员、属性名 → 属性值（列）、属性名 → 属性值 → 枚举成员
+        members = tuple(cls)
+        columns = {pk[1:-1]: tuple(member.__dict__.get(pk) for member in members) for pk in pks}
+        groups = {}
+        for pk, column in columns.items():
+            group = {}
+            for member, pv in zip(members, column):
+                group.setdefault(pv, []).append(member)
+            groups[pk] = MappingProxyType({pv: tuple(ms) for pv, ms in group.items()})
+        cls._lookup_table_ = MappingProxyType({member.value: member for member in members})
+        empty = hasattr(cls, '__empty__')
+        cls._names_ = (('__empty__',) if empty else ()) + tuple(member.name for member in members)
+        cls._values_ = ((None,) if empty else ()) + tuple(member.value for member in members)
+        cls._columns_ = MappingProxyType(columns)
+        cls._groups_ = MappingProxyType(groups)
+
+        return cls
 
     def __contains__(cls, member):
         if not isinstance(member, enum.Enum):
             # Allow non-enums to match against member values.
-            return any(x.value == member for x in cls)
+            try:
+                return member in cls._lookup_table_
+            except TypeError:
+                return False
         return super().__contains__(member)
 
     def __getattr__(cls, name):
         if not isinstance(name, str):
             raise TypeError  # pragma: no cover
-        if name[:-1] in cls.__properties__ and name.endswith('s'):
-            return [getattr(member, name[:-1]) for member in cls]
-        if name[:-2] in cls.__properties__ and name.endswith('es'):
-            return [getattr(member, name[:-2]) for member in cls]
+        columns = cls.__dict__.get('_columns_', {})
+        if name[:-1] in columns and name.endswith('s'):
+            return columns[name[:-1]]
+        if name[:-2] in columns and name.endswith('es'):
+            return columns[name[:-2]]
         return object.__getattribute__(cls, name)
 
+    def lookup(cls, value) -> enum.Enum:
+        """
+        根据枚举值查找枚举成员。与 ``cls(value)`` 的结果相同，但只是一次字典查询。
+
+        :raise ValueError: 枚举值不存在。
+        """
+        try:
+            return cls._lookup_table_[value]
+        except (KeyError, TypeError):
+            if isinstance(value, cls):
+                return value
+        raise ValueError(f'{value!r} is not a valid {cls.__qualname__}')
+
+    def where(cls, prop: str, value) -> tuple:
+        """
+        查找某个属性等于指定值的所有枚举成员。
+
+        >>> Grade.where('code', 'SR')  # (Grade.SENIOR,)
+
+        :raise KeyError: 属性不存在。
+        """
+        return cls._groups_[prop].get(value, ())
+
     # 对 __empty__ 属性的支持是为了与 Django 的 Choices 相兼容，可参见：
     # https://docs.djangoproject.com/zh-hans/4.2/ref/models/fields/#enumeration-types
 
     @property
-    def names(cls) -> list[str]:
+    def names(cls) -> tuple[str, ...]:
         """
         所有枚举成员的名称（定义枚举成员时的全大写变量名）。
         """
-        empty = ["__empty__"] if hasattr(cls, "__empty__") else []
-        return empty + [member.name for member in cls]
+        return cls._names_
 
     @property
-    def values(cls) -> list:
+    def values(cls) -> tuple:
         """
         所有枚举成员的值（定义枚举成员时等号右边元组的第一个值）。
         """
-        empty = [None] if hasattr(cls, "__empty__") else []
-        return empty + [member.value for member in cls]
+        return cls._values_
 
     @property
     def items(cls) -> dict[str, Any]:
@@ -181,11 +224,14 @@ class Items(enum.Enum, metaclass=ItemsMeta):
     >>> print(hex(Grade.SENIOR.color))  # '0xa0408e'
     >>> print(Grade.SENIOR.label)  # 'Senior'
     >>>
-    >>> print(Grade.names)  # ['FRESHMAN', 'SOPHOMORE', ...]
-    >>> print(Grade.values)  # [1, 2, 3, 4, 5]
-    >>> print(Grade.codes)  # ['FR', 'SO', 'JR', 'SR', 'GR']
-    >>> print(Grade.colors)  # [14897940, 15537588, ...]
-    >>> print(Grade.labels)  # ['Freshman', 'Sophomore', ...]
+    >>> print(Grade.names)  # ('FRESHMAN', 'SOPHOMORE', ...)
+    >>> print(Grade.values)  # (1, 2, 3, 4, 5)
+    >>> print(Grade.codes)  # ('FR', 'SO', 'JR', 'SR', 'GR')
+    >>> print(Grade.colors)  # (14897940, 15537588, ...)
+    >>> print(Grade.labels)  # ('Freshman', 'Sophomore', ...)
+    >>>
+    >>> print(Grade.lookup(4))  # Grade.SENIOR
+    >>> print(Grade.where('code', 'SR'))  # (Grade.SENIOR,)
     """
 
     __properties__ = ()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+GWK 监视包。以轮询的方式监视目录，并将新增或修改过的文件交给回调函数处理。
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    'Snapshot',
+    'DirectoryWatcher',
+]
+
+import hashlib
+import os
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+
+class Snapshot(NamedTuple):
+    """
+    文件在某一时刻的状态。
+    """
+    size: int
+    mtime: int
+    digest: str
+
+
+def digest_of(fp: Path | str, chunk_size: int = 1 << 20) -> str:
+    """
+    计算文件内容的摘要。
+
+    :param fp: 文件地址。
+    :param chunk_size: 每次读取的字节数。
+    :return: 十六进制的摘要字符串。
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(fp, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DirectoryWatcher:
+    """
+    以 ``os.scandir()`` 轮询的方式监视一个目录（不递归）。
+
+    文件需要在连续两次扫描中保持大小和修改时间不变才会被处理，以免读到写了一半的文件；
+    处理过的文件会记住 (路径, 大小, 修改时间, 摘要) ，内容没有变化的文件不会被重复处理。
+    """
+
+    def __init__(
+            self,
+            directory: Path | str,
+            callback: Callable[[Path], object],
+            interval: float = 1.0,
+            workers: int = 4,
+            accept: Callable[[Path], bool] = None,
+            on_error: Callable[[Path, BaseException], object] = None,
+    ):
+        """
+        :param directory: 要监视的目录。
+        :param callback: 处理单个文件的函数。在工作线程中调用。
+        :param interval: 两次扫描之间的间隔（秒）。
+        :param workers: 工作线程数。同时也决定了最多有多少个文件排队等待处理。
+            线程只能重叠 I/O ，CPU密集的回调应当把工作交给进程池。
+        :param accept: 判断是否需要处理某个文件的函数。默认处理所有文件。
+        :param on_error: ``callback`` 抛出异常时调用的函数。在监视线程中调用。
+        """
+        self.directory = Path(directory)
+        self.callback = callback
+        self.interval = interval
+        self.workers = max(1, workers)
+        self.accept = accept
+        self.on_error = on_error
+
+        self._stopping = threading.Event()
+        self._seen: dict[str, tuple[int, int]] = {}  # 上一次扫描时的 (大小, 修改时间)
+        self._done: dict[str, Snapshot] = {}  # 最近一次处理时的快照
+        self._pending: dict[str, Future] = {}
+
+    def stop(self, *_):
+        """
+        请求停止监视。正在处理的文件会处理完毕后再退出。
+        """
+        self._stopping.set()
+
+    def scan(self) -> list[tuple[Path, tuple[int, int]]]:
+        """
+        扫描一次目录，返回已经稳定下来且需要检查的文件。
+        """
+        ready = []
+        present = set()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                path = Path(entry.path)
+                if self.accept and not self.accept(path):
+                    continue
+
+                key = entry.path
+                present.add(key)
+                sig = stat.st_size, stat.st_mtime_ns
+                previous, self._seen[key] = self._seen.get(key), sig
+                if previous != sig or key in self._pending:
+                    continue
+                done = self._done.get(key)
+                if done and (done.size, done.mtime) == sig:
+                    continue
+                ready.append((path, sig))
+
+        # 被删除的文件不再记忆，重新出现时按新文件处理
+        for key in self._seen.keys() - present:
+            del self._seen[key]
+            self._done.pop(key, None)
+        return ready
+
+    def process(self, path: Path, sig: tuple[int, int]) -> Snapshot | None:
+        """
+        在工作线程中检查文件摘要，内容有变化时调用回调函数。
+
+        :return: 文件的新快照。
+        """
+        snapshot = Snapshot(*sig, digest_of(path))
+        done = self._done.get(str(path))
+        if done is None or done.digest != snapshot.digest:
+            try:
+                self.callback(path)
+            except Exception as e:
+                e.snapshot = snapshot
+                raise
+        return snapshot
+
+    def collect(self):
+        """
+        收集已经处理完毕的文件的结果。
+        """
+        for key, future in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[key]
+            exc = future.exception()
+            if exc is None:
+                self._done[key] = future.result()
+                continue
+            # 处理失败的文件在内容发生变化之前不会重试
+            if hasattr(exc, 'snapshot'):
+                self._done[key] = exc.snapshot
+            if self.on_error:
+                self.on_error(Path(key), exc)
+
+    def run(self):
+        """
+        开始监视，直到收到 SIGINT、SIGTERM 或调用了 ``.stop()`` 。
+        """
+        handled = [getattr(signal, name) for name in ('SIGINT', 'SIGTERM', 'SIGBREAK') if hasattr(signal, name)]
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            previous = {sig: signal.signal(sig, self.stop) for sig in handled}
+
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix='gwk-watch') as pool:
+                while not self._stopping.is_set():
+                    self.collect()
+                    for path, sig in self.scan():
+                        if len(self._pending) >= self.workers * 2:
+                            break  # 剩下的文件留到下一轮扫描
+                        self._pending[str(path)] = pool.submit(self.process, path, sig)
+                    self._stopping.wait(self.interval)
+            self.collect()
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
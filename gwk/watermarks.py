@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+GWK 水位线包。用于增量转换：记录每个玩家每个卡池已经输出过的最新一条祈愿记录，下次转换时跳过不晚于它的记录。
+
+状态文件是一个JSON对象::
+
+    {
+        "100000001": {
+            "301": {"time": "2023-01-01 00:00:00", "id": "1672502400000000001"}
+        }
+    }
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    'StateFormatError',
+    'Watermark',
+    'Watermarks',
+]
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from gwk.constants import DATETIME_FORMAT, GachaType
+from gwk.models import Record
+
+
+class StateFormatError(Exception):
+    """
+    状态文件的格式不正确。
+    """
+
+    def __init__(self, msg: str):
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
+
+
+def id_key(rid: str) -> tuple[int, str]:
+    """
+    祈愿记录ID的排序依据。ID都是数字，先比较长度再比较字符串，等价于按整数比较，但不需要转换。
+    """
+    return len(rid), rid
+
+
+class Watermark(NamedTuple):
+    """
+    某个玩家某个卡池已经输出过的最新一条祈愿记录。
+    """
+    time: datetime
+    id: str = ''
+
+    def covers(self, time: datetime, rid: str | None) -> bool:
+        """
+        判断一条祈愿记录是否不晚于水位线（即已经输出过）。双方都有ID时比较ID，否则比较时间。
+        """
+        if rid and self.id:
+            return id_key(str(rid)) <= id_key(self.id)
+        return time <= self.time
+
+    def newer(self, time: datetime, rid: str | None) -> bool:
+        """
+        判断一条祈愿记录是否晚于水位线。与 ``.covers()`` 相反，但同一时间的记录会按ID比较，用于推进水位线。
+        """
+        if time != self.time:
+            return time > self.time
+        return bool(rid) and id_key(str(rid)) > id_key(self.id or '')
+
+
+class Watermarks:
+    """
+    所有玩家所有卡池的水位线。
+
+    判断记录是否需要输出时只使用读取时的水位线；推进后的水位线另外保存，直到下次读取才生效，
+    因此同一次转换中记录的先后顺序不影响判断结果。
+
+    >>> marks = Watermarks.load('state.json')
+    >>> new_records = [r for r in records if marks.admits(r.types, r.time, r.id, r.uid)]
+    >>> marks.save('state.json')
+    """
+
+    def __init__(self, marks: dict[tuple[str, GachaType], Watermark] = None):
+        self.marks: dict[tuple[str, GachaType], Watermark] = dict(marks or {})
+        self.advanced: dict[tuple[str, GachaType], Watermark] = dict(self.marks)
+
+    def __len__(self):
+        return len(self.marks)
+
+    def get(self, uid: str, types: GachaType) -> Watermark | None:
+        return self.marks.get((uid or '', types))
+
+    def admits(self, types: GachaType, time: datetime, rid: str | None, uid: str | None) -> bool:
+        """
+        判断一条祈愿记录是否需要输出，即是否晚于所在玩家、所在卡池的水位线。没有水位线时总是需要输出。
+        """
+        mark = self.marks.get((uid or '', types))
+        return mark is None or not mark.covers(time, rid)
+
+    def advance(self, record: Record):
+        """
+        如果祈愿记录晚于推进后的水位线，就把它推进到这条记录。不影响 ``.admits()`` 。
+        """
+        key = record.uid or '', record.types
+        mark = self.advanced.get(key)
+        if mark is None or mark.newer(record.time, record.id):
+            self.advanced[key] = Watermark(record.time, str(record.id or ''))
+
+    def track(self, records: Iterable[Record]) -> Iterator[Record]:
+        """
+        原样产出祈愿记录，同时推进水位线。应当在记录全部写入成功之后再调用 ``.save()`` 。
+        """
+        for record in records:
+            self.advance(record)
+            yield record
+
+    @classmethod
+    def load(cls, fp: Path | str) -> Watermarks:
+        """
+        读取状态文件。文件不存在时返回空的水位线，即第一次转换会输出所有记录。
+
+        :raise StateFormatError: 状态文件格式不正确。
+        """
+        try:
+            with open(fp, 'r', encoding='UTF-8') as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        except json.JSONDecodeError:
+            raise StateFormatError('状态文件不是JSON文件，或文件有损坏。')
+        if not isinstance(raw, dict):
+            raise StateFormatError('状态文件的主体应当是一个对象。')
+
+        marks = {}
+        for uid, pools in raw.items():
+            if not isinstance(pools, dict):
+                raise StateFormatError(f'玩家 {uid} 的水位线不是一个 对象 。')
+            for gacha_type, mark in pools.items():
+                try:
+                    types = GachaType.lookup(gacha_type)
+                    time = datetime.strptime(mark['time'], DATETIME_FORMAT)
+                    rid = str(mark.get('id') or '')
+                except (ValueError, TypeError, KeyError, AttributeError):
+                    raise StateFormatError(f'玩家 {uid} 卡池 {gacha_type} 的水位线格式不正确。')
+                marks[uid, types] = Watermark(time, rid)
+        return cls(marks)
+
+    def save(self, fp: Path | str):
+        """
+        保存推进后的水位线。先写到临时文件再替换，以免中途出错破坏原来的状态。
+        """
+        raw: dict[str, dict[str, dict]] = {}
+        for (uid, types), mark in sorted(self.advanced.items(), key=lambda p: (p[0][0], p[0][1].value)):
+            raw.setdefault(uid, {})[types.value] = {
+                'time': mark.time.strftime(DATETIME_FORMAT),
+                'id': mark.id,
+            }
+        temp = Path(f'{fp}.tmp')
+        with open(temp, 'w', encoding='UTF-8') as f:
+            json.dump(raw, f, ensure_ascii=False, indent=2)
+        os.replace(temp, fp)
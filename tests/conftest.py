@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+from typing import Callable, Iterable
+
+import pytest
+
+UID = '100000001'
+
+
+def build_uigf(rows: Iterable[tuple[str, int, str]] | int = 3, uid: str = UID) -> bytes:
+    """
+    生成 UIGF 格式的JSON文件内容。所有记录都是同一天的三星武器“冷刃”。
+
+    :param rows: 每条记录的 (gacha_type, 秒数, ID) 。传入整数时生成这么多条角色活动祈愿的记录，
+        第 i 条记录的秒数为 i ， ID 为 1662307200000000000 + i 。
+    :param uid: 文件中的UID。
+    :return: UTF-8 编码的文件内容。
+    """
+    if isinstance(rows, int):
+        rows = [('301', i, str(1662307200000000000 + i)) for i in range(rows)]
+    return json.dumps({
+        'info': {'uid': uid, 'lang': 'zh-cn', 'export_time': '2022-09-05 00:00:00'},
+        'list': [
+            {
+                'gacha_type': gacha_type,
+                'time': f'2022-09-05 00:00:{second:02}',
+                'name': '冷刃',
+                'item_type': '武器',
+                'rank_type': '3',
+                'id': rid,
+            }
+            for gacha_type, second, rid in rows
+        ],
+    }, ensure_ascii=False).encode('UTF-8')
+
+
+@pytest.fixture
+def make_uigf() -> Callable[..., bytes]:
+    return build_uigf
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import pytest
+
+from gwk.common import ID64_MAX, decode_id64, encode_id64, patch_id64
+from gwk.constants import DT_DREAM_START, GachaType
+from gwk.models import GachaData, Item, Record
+
+
+@pytest.mark.parametrize('time, uid, offset', [
+    (DT_DREAM_START, '0', 0),
+    (datetime(2022, 9, 5), '100000001', 0),
+    (datetime(2022, 9, 5, 12, 34, 56), 800000123, 9),
+    (datetime(2023, 11, 29, 9, 46, 40), '999999999', 5),
+    (datetime(2049, 12, 20, 4, 46, 43), '685477580', 7),  # 恰好是 ID64_MAX
+])
+def test_id64_round_trip(time, uid, offset):
+    value = encode_id64(time, uid, offset)
+    assert value is not None and 0 <= value <= ID64_MAX
+    assert decode_id64(value) == (time, str(uid).rjust(9, '0'), offset)
+    assert decode_id64(str(value)) == decode_id64(value)
+
+
+def test_id64_docstring_example():
+    assert decode_id64('610848001000000010') == (datetime(2022, 9, 5), '100000001', 0)
+    assert encode_id64(datetime(2022, 9, 5), '100000001') == 610848001000000010
+
+
+@pytest.mark.parametrize('time, uid, offset', [
+    (None, '100000001', 0),
+    (DT_DREAM_START - timedelta(seconds=1), '100000001', 0),
+    (datetime(2049, 12, 20, 4, 46, 43), '685477580', 8),
+    (datetime(2049, 12, 20, 4, 46, 44), '0', 0),
+    (datetime(2022, 9, 5), '1000000000', 0),
+    (datetime(2022, 9, 5), 'abc', 0),
+    (datetime(2022, 9, 5), '100000001', 10),
+    (datetime(2022, 9, 5), '100000001', -1),
+])
+def test_encode_id64_invalid(time, uid, offset):
+    assert encode_id64(time, uid, offset) is None
+
+
+def test_decode_id64_negative():
+    with pytest.raises(ValueError):
+        decode_id64(-1)
+
+
+def test_patch_id64_unique():
+    time = datetime(2022, 9, 5)
+    data = GachaData()
+    data.uid = '100000001'
+    data[GachaType.CHARACTER_EVENT_WISH] = [
+        Record(GachaType.CHARACTER_EVENT_WISH, time, Item('冷刃', '武器', '3'))
+        for _ in range(10)
+    ]
+    # 已有的ID占用了第一个偏移量
+    data[GachaType.CHARACTER_EVENT_WISH][3].id = str(encode_id64(time, '100000001'))
+
+    assert patch_id64(data) == (9, 9)
+    ids = [record.id for record in data[GachaType.CHARACTER_EVENT_WISH]]
+    assert len(set(ids)) == 10
+    assert {decode_id64(rid) for rid in ids} == {(time, '100000001', offset) for offset in range(10)}
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import http.client
+import json
+import threading
+
+import pytest
+
+from gwk.server import ConversionServer
+
+
+@pytest.fixture(scope='module')
+def server():
+    with ConversionServer(('127.0.0.1', 0), workers=1, max_jobs=1, max_size=1 << 16) as serving:
+        thread = threading.Thread(target=serving.serve_forever, daemon=True)
+        thread.start()
+        yield serving
+        serving.shutdown()
+        thread.join()
+
+
+def request(server: ConversionServer, method: str, path: str, body: bytes = None) -> tuple[http.client.HTTPResponse, bytes]:
+    conn = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        conn.request(method, path, body)
+        response = conn.getresponse()
+        return response, response.read()
+    finally:
+        conn.close()
+
+
+def test_convert(server, make_uigf):
+    response, body = request(server, 'POST', '/convert?writer=Ndjson', make_uigf(3))
+    assert response.status == 200
+    assert response.getheader('Content-Type') == 'application/x-ndjson'
+    assert response.getheader('X-Rows-Converted') == '3'
+    rows = [json.loads(line) for line in body.decode('UTF-8').splitlines()]
+    assert [row['id'] for row in rows] == ['1662307200000000000', '1662307200000000001', '1662307200000000002']
+
+
+@pytest.mark.parametrize('query', ['', 'writer=Nope', 'writer=Csv&reader=Nope'])
+def test_bad_request(server, make_uigf, query):
+    response, _ = request(server, 'POST', f'/convert?{query}', make_uigf())
+    assert response.status == 400
+    assert response.getheader('Connection') == 'close'
+
+
+def test_too_large(server):
+    response, _ = request(server, 'POST', '/convert?writer=Csv', b' ' * (server.max_size + 1))
+    assert response.status == 413
+    assert response.getheader('Connection') == 'close'
+
+
+def test_unprocessable(server):
+    response, _ = request(server, 'POST', '/convert?writer=Csv', b'{"not": "gacha"}')
+    assert response.status == 422
+
+
+def test_busy(server, make_uigf):
+    assert server.slots.acquire(blocking=False)
+    try:
+        response, _ = request(server, 'POST', '/convert?writer=Csv', make_uigf())
+    finally:
+        server.slots.release()
+    assert response.status == 503
+    assert response.getheader('Retry-After') == '1'
+    assert response.getheader('Connection') == 'close'
+
+
+def test_metrics(server, make_uigf):
+    request(server, 'POST', '/convert?writer=Csv', make_uigf(2))
+    response, body = request(server, 'GET', '/metrics')
+    assert response.status == 200
+    text = body.decode('UTF-8')
+    assert 'gwk_requests_total{status="200"}' in text
+    assert 'gwk_jobs_in_flight 0' in text
+    rows = next(line for line in text.splitlines() if line.startswith('gwk_rows_converted_total '))
+    assert int(rows.split()[1]) >= 2
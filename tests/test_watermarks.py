@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import datetime
+
+import pytest
+
+from gwk.api import iter_records
+from gwk.constants import GachaType
+from gwk.models import Item, Record
+from gwk.watermarks import StateFormatError, Watermark, Watermarks
+
+UID = '100000001'
+CHARACTER = GachaType.CHARACTER_EVENT_WISH
+WEAPON = GachaType.WEAPON_EVENT_WISH
+
+
+def make_record(types: GachaType, second: int, rid: str = '', uid: str = UID) -> Record:
+    return Record(types, datetime(2022, 9, 5, 0, 0, second), Item('冷刃', '武器', '3'), id=rid, uid=uid)
+
+
+def test_covers_compares_ids_then_times():
+    mark = Watermark(datetime(2022, 9, 5, 0, 0, 10), '1000')
+    assert mark.covers(datetime(2022, 9, 5, 0, 0, 59), '999')  # 有ID时只比较ID
+    assert mark.covers(datetime(2022, 9, 5), '1000')
+    assert not mark.covers(datetime(2022, 9, 5), '1001')
+    assert not mark.covers(datetime(2022, 9, 5), '10000')  # 按整数比较，而不是按字符串比较
+    assert mark.covers(datetime(2022, 9, 5, 0, 0, 10), '')
+    assert not mark.covers(datetime(2022, 9, 5, 0, 0, 11), None)
+
+
+def test_newer_breaks_ties_by_id():
+    mark = Watermark(datetime(2022, 9, 5, 0, 0, 10), '1000')
+    assert Watermark(datetime(2022, 9, 5, 0, 0, 10), '').newer(mark.time, '1')
+    assert mark.newer(datetime(2022, 9, 5, 0, 0, 10), '1001')
+    assert not mark.newer(datetime(2022, 9, 5, 0, 0, 10), '999')
+    assert not mark.newer(datetime(2022, 9, 5, 0, 0, 10), '')
+    assert mark.newer(datetime(2022, 9, 5, 0, 0, 11), '1')
+    assert not mark.newer(datetime(2022, 9, 5, 0, 0, 9), '9999')
+
+
+def test_admits_without_marks():
+    marks = Watermarks()
+    assert len(marks) == 0
+    assert marks.admits(CHARACTER, datetime(2000, 1, 1), None, UID)
+
+
+def test_admits_per_uid_and_pool():
+    marks = Watermarks({(UID, CHARACTER): Watermark(datetime(2022, 9, 5, 0, 0, 10), '1000')})
+    assert not marks.admits(CHARACTER, datetime(2022, 9, 5, 0, 0, 10), '1000', UID)
+    assert marks.admits(CHARACTER, datetime(2022, 9, 5, 0, 0, 10), '1001', UID)
+    assert marks.admits(WEAPON, datetime(2022, 9, 5, 0, 0, 10), '1000', UID)
+    assert marks.admits(CHARACTER, datetime(2022, 9, 5, 0, 0, 10), '1000', '100000002')
+
+
+def test_advance_does_not_affect_admits():
+    marks = Watermarks()
+    records = [make_record(CHARACTER, 2, '1002'), make_record(CHARACTER, 1, '1001'), make_record(WEAPON, 3, '1003')]
+    assert list(marks.track(records)) == records
+    # 同一次转换中推进的水位线不会跳过之后的记录
+    assert marks.admits(CHARACTER, datetime(2022, 9, 5, 0, 0, 1), '1001', UID)
+    assert marks.advanced == {
+        (UID, CHARACTER): Watermark(datetime(2022, 9, 5, 0, 0, 2), '1002'),
+        (UID, WEAPON): Watermark(datetime(2022, 9, 5, 0, 0, 3), '1003'),
+    }
+
+
+def test_advance_keeps_latest():
+    marks = Watermarks({(UID, CHARACTER): Watermark(datetime(2022, 9, 5, 0, 0, 5), '1005')})
+    marks.advance(make_record(CHARACTER, 4, '1004'))
+    assert marks.advanced[UID, CHARACTER] == Watermark(datetime(2022, 9, 5, 0, 0, 5), '1005')
+    marks.advance(make_record(CHARACTER, 5, '1006'))
+    assert marks.advanced[UID, CHARACTER] == Watermark(datetime(2022, 9, 5, 0, 0, 5), '1006')
+
+
+def test_save_and_load(tmp_path):
+    state = tmp_path / 'state.json'
+    assert len(Watermarks.load(state)) == 0
+
+    marks = Watermarks()
+    marks.advance(make_record(CHARACTER, 2, '1002'))
+    marks.advance(make_record(WEAPON, 3))
+    marks.save(state)
+    assert not (tmp_path / 'state.json.tmp').exists()
+
+    loaded = Watermarks.load(state)
+    assert loaded.marks == marks.advanced
+    assert json.loads(state.read_text('UTF-8')) == {
+        UID: {
+            '301': {'time': '2022-09-05 00:00:02', 'id': '1002'},
+            '302': {'time': '2022-09-05 00:00:03', 'id': ''},
+        },
+    }
+
+
+@pytest.mark.parametrize('content', [
+    '{x',
+    '[]',
+    '{"100000001": []}',
+    '{"100000001": {"999": {"time": "2022-09-05 00:00:00"}}}',
+    '{"100000001": {"301": {"time": "yesterday"}}}',
+    '{"100000001": {"301": {}}}',
+])
+def test_load_invalid(tmp_path, content):
+    state = tmp_path / 'state.json'
+    state.write_text(content, 'UTF-8')
+    with pytest.raises(StateFormatError):
+        Watermarks.load(state)
+
+
+def test_incremental_reading(tmp_path, make_uigf):
+    state = tmp_path / 'state.json'
+    first = [('301', 1, '1001'), ('301', 2, '1002'), ('302', 1, '2001')]
+    second = first + [('301', 2, '1003'), ('302', 1, '2002'), ('301', 3, '1004')]
+
+    marks = Watermarks.load(state)
+    with iter_records(make_uigf(first), 'UigfJson', watermarks=marks) as records:
+        assert [r.id for r in marks.track(records)] == ['1001', '1002', '2001']
+    marks.save(state)
+
+    marks = Watermarks.load(state)
+    with iter_records(make_uigf(second), 'UigfJson', watermarks=marks) as records:
+        assert [r.id for r in marks.track(records)] == ['1003', '2002', '1004']
+        assert records.handler.rows_total_read == 6
+        assert records.handler.rows_total_skipped == 3
+    marks.save(state)
+
+    marks = Watermarks.load(state)
+    with iter_records(make_uigf(second), 'UigfJson', watermarks=marks) as records:
+        assert list(records) == []